@@ -6,8 +6,12 @@ of llama.cpp for their system programatically:
   import fetch_llama_cpp
 
   fetch_llama_cpp.fetch()
+
+or from asyncio code, with progress events and cancellation:
+
+  await fetch_llama_cpp.fetch_async(progress=print)
 """
-from .fetch_llama_cpp import fetch
+from .fetch_llama_cpp import fetch, fetch_async, fetch_events
 
 """Top-level package for fetch_llama_cpp."""
 
@@ -6,7 +6,7 @@ the latest and best version of llama.cpp for their system:
   python -m fetch_llama_cpp
 
 """
-from .fetch_llama_cpp import main
+from .fetch_llama_cpp import cli
 
 if __name__ == "__main__":
-    main()
+    cli()
@@ -3,20 +3,152 @@ import requests
 import platform
 import re
 import os
+import sys
+import json
+import time
+import shutil
+import hashlib
+import threading
+import datetime
+import functools
 import subprocess
 import cpuinfo
+import io
+import fnmatch
 import zipfile
+import math
+import contextlib
+import concurrent.futures
+import asyncio
 import tarfile
-from pathlib import Path
+import urllib.parse
+import urllib.request
+import email.utils
+import sqlite3
+import ctypes
+from pathlib import Path, PurePosixPath
 from packaging.version import parse as version_parse
 
-# Repository information
+if os.name == 'nt':
+    import msvcrt
+else:
+    import fcntl
+
+# Repository information. Hosts without GitHub access can point FETCH_LLAMA_CPP_MIRROR
+# at a mirror built by mirror(), served over HTTP or as a file:// URL, or override
+# the API and download URLs separately. Asset URLs keep their GitHub path
+# (/<repo>/releases/download/<tag>/<name>) below DOWNLOAD_BASE_URL.
 GITHUB_REPO = "ggerganov/llama.cpp"
-GITHUB_API_URL = "https://api.github.com/repos/{repo}/releases/{tags}{version}"
+GITHUB_DEFAULT_API_URL = "https://api.github.com/repos/{repo}/releases/{tags}{version}"
+MIRROR_URL = os.environ.get("FETCH_LLAMA_CPP_MIRROR", "").rstrip("/") or None
+GITHUB_API_URL = os.environ.get("FETCH_LLAMA_CPP_API_URL") \
+    or (f"{MIRROR_URL}/api/repos/{{repo}}/releases/{{tags}}{{version}}" if MIRROR_URL else GITHUB_DEFAULT_API_URL)
+DOWNLOAD_BASE_URL = os.environ.get("FETCH_LLAMA_CPP_DOWNLOAD_URL", "").rstrip("/") or MIRROR_URL
 EXTRACT_DIR = Path("llama.cpp")
 DOWNLOAD_DIR = EXTRACT_DIR
 DEBUG = False
 
+# Optional GitHub token raises the API rate limit from 60 to 5,000 requests per hour
+GITHUB_TOKEN = os.environ.get("FETCH_LLAMA_CPP_GITHUB_TOKEN") or os.environ.get("GITHUB_TOKEN")
+_rate_limit_lock = threading.Lock()
+
+# Release metadata is cached trimmed to these fields; tagged releases are cached
+# permanently once they are older than RELEASE_SETTLE_TIME (assets are uploaded
+# by CI for a while after a release is published)
+RELEASE_FIELDS = ["tag_name", "name", "draft", "prerelease", "created_at", "published_at"]
+ASSET_FIELDS = ["name", "size", "digest", "content_type", "browser_download_url", "updated_at"]
+RELEASE_SETTLE_TIME = 60 * 60
+
+# The local release index (a SQLite database next to the metadata cache) is synced
+# from the paginated /releases endpoint, RELEASE_SYNC_WORKERS pages at a time, and
+# answers version specifiers such as ">=b3000,<b3100" without network access
+RELEASES_PER_PAGE = 100
+RELEASE_SYNC_WORKERS = 8
+RELEASE_INDEX_NAME = "index.sqlite"
+
+# Hardware detection reads /proc and /sys under HARDWARE_ROOT on Linux and falls back
+# to nvidia-smi, lspci and py-cpuinfo elsewhere; each probe is bounded by the timeout
+HARDWARE_ROOT = Path(os.environ.get("FETCH_LLAMA_CPP_HARDWARE_ROOT", "/"))
+HARDWARE_PROBE_TIMEOUT = 5
+PCI_VENDORS = {"0x10de": "nvidia", "0x1002": "amd", "0x8086": "intel"}
+
+# Releases are installed side by side under EXTRACT_DIR/versions and activated by
+# atomically swapping the EXTRACT_DIR/current symlink; EXTRACT_DIR/previous points
+# at the version it replaced for instant rollback
+EXTRACT_WORKERS = min(8, os.cpu_count() or 1)
+NON_BINARY_EXTENSIONS = {'.txt', '.md', '.json', '.xml'}
+KEEP_VERSIONS = max(int(os.environ.get("FETCH_LLAMA_CPP_KEEP_VERSIONS", 2)), 2)
+
+# Extracted files are kept once in a content-addressed store, EXTRACT_DIR/blobs, and
+# hardlinked (or reflinked, or failing that copied) into each version, so files
+# shared between versions take space once and are only decompressed once
+DEDUP_STORE = os.environ.get("FETCH_LLAMA_CPP_DEDUP", "1") != "0"
+STORE_CATALOG_NAME = "catalog.json"
+FICLONE = 0x40049409  # Linux reflink ioctl
+
+# Every versioned install records what was installed and the size and SHA-256 of
+# each file, letting fetch() skip the network entirely when the right build is
+# already active ('latest' is trusted for LATEST_TTL seconds)
+MANIFEST_NAME = ".fetch_llama_cpp.json"
+LATEST_TTL = 60 * 60
+
+# Zip assets can be installed selectively: the central directory is read remotely
+# with HTTP Range requests and only members matching the include globs (matched
+# against their installed, flattened names) are fetched. Named profiles expand to
+# the globs below.
+INCLUDE_PROFILES = {
+    "server": ["llama-server", "llama-server.exe", "server", "server.exe", "main", "main.exe",
+               "*.so", "*.so.*", "*.dylib", "*.dll", "*.metal", "*.metallib", "LICENSE*"],
+    "cli": ["llama-cli", "llama-cli.exe", "main", "main.exe",
+            "*.so", "*.so.*", "*.dylib", "*.dll", "*.metal", "*.metallib", "LICENSE*"],
+}
+REMOTE_ZIP_TAIL_SIZE = 256 * 1024
+
+# Tune mode installs the top TUNE_CANDIDATES compatible builds, times a short token
+# generation run on a small GGUF model with each and activates the fastest. The
+# winning variant is remembered per host profile and reused by later fetches.
+TUNE_CANDIDATES = 3
+TUNE_MODEL = os.environ.get("FETCH_LLAMA_CPP_TUNE_MODEL")
+TUNE_TOKENS = 32
+TUNE_TIMEOUT = 300
+
+# Download tuning: assets are streamed to disk in fixed-size chunks so peak memory
+# stays flat regardless of asset size, and interrupted downloads resume via HTTP Range
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+DOWNLOAD_RETRIES = 5
+DOWNLOAD_BACKOFF = 1.0
+DOWNLOAD_TIMEOUT = 30
+
+# Segmented downloads fetch byte ranges of an asset over several pooled connections
+# at once to get around per-connection throttling; 1 disables segmentation. Their
+# progress is checkpointed every SEGMENT_STATE_INTERVAL seconds for resuming.
+DOWNLOAD_CONNECTIONS = 4
+DOWNLOAD_MIN_SEGMENT_SIZE = 8 * 1024 * 1024
+SEGMENT_STATE_INTERVAL = 1.0
+
+# Processes sharing an install or cache directory coordinate through lock files so
+# concurrent fetch() callers share a single download and install
+LOCK_TIMEOUT = 60 * 60
+LOCK_POLL_INTERVAL = 0.1
+_held_locks = threading.local()
+
+# mirror() resolves releases and downloads assets with this many concurrent
+# connections; MIRROR_INDEX_NAME lists everything a mirror holds
+MIRROR_WORKERS = 8
+MIRROR_INDEX_NAME = "index.json"
+
+# fetch_async() publishes at most one progress event per PROGRESS_INTERVAL seconds,
+# plus one whenever a phase starts or completes
+PROGRESS_INTERVAL = 0.1
+
+# Downloaded assets are kept in a content-addressed cache shared across fetch() calls
+# (and virtualenvs/containers sharing the directory), evicted least recently used first
+CACHE_DIR = Path(
+    os.environ.get("FETCH_LLAMA_CPP_CACHE_DIR")
+    or Path(os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache") / "fetch_llama_cpp"
+)
+CACHE_MAX_SIZE = int(os.environ.get("FETCH_LLAMA_CPP_CACHE_MAX_SIZE", 4 * 1024 * 1024 * 1024))
+
 # CUDA version to driver version mapping
 CUDA_DRIVER_MAP = {
     "12.5.0": {"linux": "555.42.02", "windows": "555.85"},
@@ -39,17 +171,372 @@ def debug_print(message, **kwargs):
     if DEBUG:
         print(message, **kwargs)
 
-def get_release_info(version="latest"):
+class RateLimitError(requests.HTTPError):
+    pass
+
+# Only the fields select_best_asset and fetch() need are kept in the metadata cache
+def trim_release_info(release_info):
+    release = {field: release_info.get(field) for field in RELEASE_FIELDS}
+    release['assets'] = [{field: asset.get(field) for field in ASSET_FIELDS} for asset in release_info.get('assets', [])]
+    return release
+
+def _github_headers(url):
+    headers = {"Accept": "application/vnd.github+json"}
+    # Never hand the token to a mirror
+    if GITHUB_TOKEN and url.startswith("https://api.github.com/"):
+        headers["Authorization"] = f"Bearer {GITHUB_TOKEN}"
+    return headers
+
+# Mirrors only list the assets they carry, so their metadata is cached separately
+def _release_cache_dir(cache_dir=None):
+    name = GITHUB_REPO.replace("/", "_")
+    if GITHUB_API_URL != GITHUB_DEFAULT_API_URL:
+        name += "-" + hashlib.sha256(GITHUB_API_URL.encode()).hexdigest()[:12]
+    return Path(cache_dir or CACHE_DIR) / "releases" / name
+
+# Kept per API URL, so an exhausted GitHub limit never blocks lookups through a mirror
+def _rate_limit_path(cache_dir=None):
+    return _release_cache_dir(cache_dir) / "rate_limit.json"
+
+def _read_json(path):
+    try:
+        return json.loads(Path(path).read_text())
+    except (FileNotFoundError, ValueError):
+        return None
+
+# Writes to a temporary file unique to this writer (process and thread) and renames
+# it into place, so readers and concurrent writers never see a half-written file
+def _write_json(path, data):
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    tmp_path.write_text(json.dumps(data, indent=2))
+    tmp_path.replace(path)
+
+def _record_rate_limit(response, cache_dir=None):
+    remaining = response.headers.get("X-RateLimit-Remaining")
+    reset = response.headers.get("X-RateLimit-Reset")
+    if remaining is None or reset is None:
+        return
+    rate_limit = {
+        "limit": int(response.headers.get("X-RateLimit-Limit", 0)),
+        "remaining": int(remaining),
+        "reset": int(reset),
+        "authenticated": bool(GITHUB_TOKEN),
+    }
+    debug_print(f"GitHub API rate limit: {rate_limit['remaining']}/{rate_limit['limit']} remaining.")
+    # Concurrent lookups (mirror(), the release index sync) can finish out of order;
+    # within one rate limit window keep the lowest remaining count seen
+    with _rate_limit_lock:
+        recorded = _read_json(_rate_limit_path(cache_dir))
+        if recorded and recorded.get("reset") == rate_limit["reset"] \
+                and recorded.get("authenticated") == rate_limit["authenticated"] \
+                and recorded.get("remaining", 0) < rate_limit["remaining"]:
+            return
+        _write_json(_rate_limit_path(cache_dir), rate_limit)
+
+def _rate_limit_exhausted(cache_dir=None):
+    rate_limit = _read_json(_rate_limit_path(cache_dir)) if CACHE_DIR else None
+    return bool(rate_limit) and rate_limit["authenticated"] == bool(GITHUB_TOKEN) \
+        and rate_limit["remaining"] == 0 and rate_limit["reset"] > time.time()
+
+# Whether a release is old enough that CI has finished uploading its assets
+def _is_settled(release):
+    published_at = release.get("published_at")
+    return bool(published_at) and time.time() - datetime.datetime.strptime(
+        published_at, "%Y-%m-%dT%H:%M:%SZ").replace(tzinfo=datetime.timezone.utc).timestamp() > RELEASE_SETTLE_TIME
+
+def get_release_info(version="latest", use_cache=True):
     debug_print(f"Fetching the {version} release information from GitHub...")
     if version == "latest":
         url = GITHUB_API_URL.format(repo=GITHUB_REPO, tags="", version="latest")
     else:
         url = GITHUB_API_URL.format(repo=GITHUB_REPO, tags="tags/", version=version)
-    
-    response = requests.get(url)
+
+    cache_path = _release_cache_dir() / f"{version}.json" if use_cache and CACHE_DIR else None
+    cached = _read_json(cache_path) if cache_path else None
+
+    # Tagged releases never change once their assets have finished uploading
+    if cached and version != "latest" and cached.get("settled"):
+        debug_print(f"Using cached {version} release information.")
+        return cached["release"]
+
+    if _rate_limit_exhausted():
+        if cached:
+            debug_print("GitHub API rate limit exhausted; using cached release information.")
+            return cached["release"]
+        raise RateLimitError("GitHub API rate limit exhausted; set GITHUB_TOKEN to raise the limit.")
+
+    headers = _github_headers(url)
+    if cached and cached.get("etag"):
+        headers["If-None-Match"] = cached["etag"]
+    if cached and cached.get("last_modified"):
+        headers["If-Modified-Since"] = cached["last_modified"]
+
+    with _new_session() as session:
+        response = session.get(url, headers=headers, timeout=DOWNLOAD_TIMEOUT)
+    if cache_path:
+        _record_rate_limit(response)
+
+    if response.status_code == 304:
+        debug_print(f"{version.capitalize()} release information has not changed.")
+        return cached["release"]
+    if response.status_code in (403, 429) and response.headers.get("X-RateLimit-Remaining") == "0":
+        if cached:
+            debug_print("GitHub API rate limit exhausted; using cached release information.")
+            return cached["release"]
+        raise RateLimitError("GitHub API rate limit exhausted; set GITHUB_TOKEN to raise the limit.", response=response)
     response.raise_for_status()
+    release = trim_release_info(response.json())
     debug_print(f"{version.capitalize()} release information fetched successfully.")
-    return response.json()
+
+    if cache_path:
+        entry = {
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+            "settled": _is_settled(release),
+            "release": release,
+        }
+        _write_json(cache_path, entry)
+        if version == "latest" and release.get("tag_name"):
+            _write_json(_release_cache_dir() / f"{release['tag_name']}.json", dict(entry, etag=None, last_modified=None))
+    return release
+
+def _tag_number(tag):
+    match = re.match(r'b(\d+)$', tag or '')
+    return int(match.group(1)) if match else None
+
+VERSION_CLAUSE_PATTERN = re.compile(r'^(==|!=|>=|<=|>|<)?\s*b?(\d+)$')
+
+# Whether version is a specifier for the release index rather than "latest" or a tag
+def is_version_spec(version):
+    return version != "latest" and not re.match(r'^b?\d+$', version)
+
+# Parses a version specifier into (operator, build number) clauses that must all
+# hold: comma-separated comparisons such as ">=b3000,<b3100,!=b3050", inclusive
+# ranges such as "b3000..b3100" (either end may be left open), or "*" for any
+def parse_version_spec(spec):
+    spec = spec.strip()
+    if spec in ("", "*", "latest"):
+        return []
+    if ".." in spec:
+        low, high = (part.strip() for part in spec.split("..", 1))
+        spec = ",".join(clause for clause in (f">={low}" if low else "", f"<={high}" if high else "") if clause)
+        if not spec:
+            return []
+    clauses = []
+    for part in spec.split(","):
+        match = VERSION_CLAUSE_PATTERN.match(part.strip())
+        if not match:
+            raise ValueError(f"Invalid version specifier: {spec}")
+        clauses.append((match.group(1) or "==", int(match.group(2))))
+    return clauses
+
+def _release_index_path(cache_dir=None):
+    return _release_cache_dir(cache_dir) / RELEASE_INDEX_NAME
+
+def _open_release_index(cache_dir=None):
+    path = _release_index_path(cache_dir)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    db = sqlite3.connect(path, timeout=LOCK_TIMEOUT)
+    db.executescript("""
+        CREATE TABLE IF NOT EXISTS releases (
+            tag TEXT PRIMARY KEY, number INTEGER, name TEXT, draft INTEGER, prerelease INTEGER,
+            created_at TEXT, published_at TEXT, settled INTEGER);
+        CREATE INDEX IF NOT EXISTS releases_number ON releases (number);
+        CREATE TABLE IF NOT EXISTS assets (
+            tag TEXT, name TEXT, size INTEGER, digest TEXT, content_type TEXT, url TEXT, updated_at TEXT,
+            kind TEXT, os TEXT, arch TEXT, backend TEXT, cuda_version TEXT, isa TEXT, toolchain TEXT,
+            PRIMARY KEY (tag, name));
+        CREATE INDEX IF NOT EXISTS assets_platform ON assets (os, arch, backend);
+        CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+    """)
+    return db
+
+# A mirror can't serve its release list at /releases, where its tags/ and latest
+# documents live, so mirror() publishes the whole list as one unpaginated
+# releases.json beside that directory
+def _mirror_releases():
+    return bool(MIRROR_URL) and GITHUB_API_URL.startswith(MIRROR_URL + "/")
+
+def _releases_url():
+    url = GITHUB_API_URL.format(repo=GITHUB_REPO, tags="", version="").rstrip("/")
+    return url + ".json" if _mirror_releases() else url
+
+# Fetches one page of /releases; returns (releases, response), with releases None
+# when the page hasn't changed since etag. Pages fetched on worker threads pass
+# record=False and leave recording the rate limit to the calling thread.
+def _fetch_release_page(session, page, per_page, etag=None, record=True):
+    url = _releases_url()
+    headers = _github_headers(url)
+    if etag:
+        headers["If-None-Match"] = etag
+    params = None if _mirror_releases() else {"per_page": per_page, "page": page}
+    response = session.get(url, params=params, headers=headers, timeout=DOWNLOAD_TIMEOUT)
+    if CACHE_DIR and record:
+        _record_rate_limit(response)
+    if response.status_code == 304:
+        return None, response
+    if response.status_code in (403, 429) and response.headers.get("X-RateLimit-Remaining") == "0":
+        raise RateLimitError("GitHub API rate limit exhausted; set GITHUB_TOKEN to raise the limit.", response=response)
+    response.raise_for_status()
+    return response.json(), response
+
+def _last_page(response):
+    match = re.search(r'[?&]page=(\d+)[^>]*>;\s*rel="last"', response.headers.get("Link", ""))
+    return int(match.group(1)) if match else None
+
+# Brings the local release index up to date and returns the number of releases
+# added or refreshed. The first sync (or full=True) reads every page, concurrently
+# once the first page's Link header gives the page count; later syncs revalidate
+# the first page with its ETag and only walk back until they reach releases that
+# were already indexed after their assets settled.
+def sync_release_index(full=False, workers=RELEASE_SYNC_WORKERS, per_page=RELEASES_PER_PAGE):
+    # A mirror's release list is a single document, so every sync of it is full
+    paginated = not _mirror_releases()
+    with contextlib.closing(_open_release_index()) as db, _new_session(workers) as session, \
+            concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+        meta = dict(db.execute("SELECT key, value FROM meta"))
+        full = full or not paginated or meta.get("complete") != "1"
+        settled = set() if full else {tag for (tag,) in db.execute("SELECT tag FROM releases WHERE settled")}
+
+        debug_print(f"Syncing the release index ({'full' if full else 'incremental'})...")
+        first, response = _fetch_release_page(session, 1, per_page, None if full else meta.get("etag"))
+        if first is None:
+            debug_print("Release index is up to date.")
+            with db:
+                db.execute("INSERT OR REPLACE INTO meta VALUES ('synced_at', ?)", (str(time.time()),))
+            return 0
+        pages = [first]
+        last = _last_page(response) if full else None
+
+        def finished():
+            return not paginated or len(pages[-1]) < per_page or (last is not None and len(pages) >= last) \
+                or any(release.get('tag_name') in settled for release in pages[-1])
+
+        while not finished():
+            batch = (last - len(pages)) if last else workers if full else 1
+            numbers = range(len(pages) + 1, len(pages) + 1 + min(batch, workers))
+            fetch_page = functools.partial(_fetch_release_page, session, per_page=per_page, record=False)
+            for releases, page_response in executor.map(fetch_page, numbers):
+                if CACHE_DIR:
+                    _record_rate_limit(page_response)
+                pages.append(releases)
+                if finished():
+                    break
+
+        releases = [trim_release_info(release) for page in pages for release in page if not release.get('draft')]
+        with db:
+            for release in releases:
+                tag = release['tag_name']
+                db.execute("INSERT OR REPLACE INTO releases VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                           (tag, _tag_number(tag), release['name'], bool(release['draft']), bool(release['prerelease']),
+                            release['created_at'], release['published_at'], _is_settled(release)))
+                db.execute("DELETE FROM assets WHERE tag = ?", (tag,))
+                for asset in release['assets']:
+                    record = parse_asset_name(asset['name']) or {}
+                    db.execute("INSERT OR REPLACE INTO assets VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                               (tag, asset['name'], asset['size'], asset['digest'], asset['content_type'],
+                                asset['browser_download_url'], asset['updated_at'], record.get('kind'), record.get('os'),
+                                record.get('arch'), record.get('backend'), record.get('cuda_version'),
+                                record.get('isa'), record.get('toolchain')))
+            if full:
+                # A full sync saw every release, so anything else was deleted upstream.
+                # The seen tags go through a temporary table: thousands of releases
+                # exceed SQLite's limit on bound parameters (999 before 3.32).
+                db.execute("CREATE TEMP TABLE IF NOT EXISTS seen (tag TEXT PRIMARY KEY)")
+                db.execute("DELETE FROM seen")
+                db.executemany("INSERT OR IGNORE INTO seen VALUES (?)", ((release['tag_name'],) for release in releases))
+                db.execute("DELETE FROM assets WHERE tag NOT IN (SELECT tag FROM seen)")
+                db.execute("DELETE FROM releases WHERE tag NOT IN (SELECT tag FROM seen)")
+                db.execute("DROP TABLE seen")
+            db.executemany("INSERT OR REPLACE INTO meta VALUES (?, ?)",
+                           [("etag", response.headers.get("ETag")), ("synced_at", str(time.time())), ("complete", "1")])
+        debug_print(f"Indexed {len(releases)} release(s) from {len(pages)} page(s).")
+        return len(releases)
+
+# Seconds since the release index was last synced, or None if it never was
+def release_index_age():
+    if not _release_index_path().exists():
+        return None
+    with contextlib.closing(_open_release_index()) as db:
+        row = db.execute("SELECT value FROM meta WHERE key = 'synced_at'").fetchone()
+    return time.time() - float(row[0]) if row else None
+
+def _release_from_rows(release_row, asset_rows):
+    tag, _, name, draft, prerelease, created_at, published_at, _ = release_row
+    release = {"tag_name": tag, "name": name, "draft": bool(draft), "prerelease": bool(prerelease),
+               "created_at": created_at, "published_at": published_at}
+    release['assets'] = [dict(zip(ASSET_FIELDS, (name, size, digest, content_type, url, updated_at)))
+                         for name, size, digest, content_type, url, updated_at in asset_rows]
+    return release
+
+# Returns the indexed releases matching a version specifier, newest first, without
+# network access. Prereleases are skipped unless asked for. system, arch, backend
+# (e.g. "cuda", "vulkan", "cpu") and cuda (a version prefix such as "12" or "12.2")
+# require a build asset with those attributes; profile requires a build that can
+# run on that host, as ranked by rank_assets.
+def query_releases(spec="latest", prerelease=False, system=None, arch=None, backend=None, cuda=None, profile=None,
+                   limit=None):
+    clauses, params = [], []
+    for operator, number in parse_version_spec(spec):
+        clauses.append(f"number {'=' if operator == '==' else operator} ?")
+        params.append(number)
+    if not prerelease:
+        clauses.append("NOT prerelease")
+    asset_clauses = ["a.kind = 'build'"]
+    if system:
+        asset_clauses.append("a.os = ?")
+        params.append(ASSET_OS_NAMES.get(system.lower(), system.lower()))
+    if arch:
+        asset_clauses.append("a.arch = ?")
+        params.append(ARCH_NAMES.get(arch.lower(), arch.lower()))
+    if backend:
+        asset_clauses.append("a.backend = ?")
+        params.append({'rocm': 'hip', 'amd': 'hip'}.get(backend.lower(), backend.lower()))
+    if cuda:
+        cuda = str(cuda).lower().lstrip("cu")
+        asset_clauses.append("(a.cuda_version = ? OR a.cuda_version LIKE ?)")
+        params += [cuda, f"{cuda}.%"]
+    if len(asset_clauses) > 1:
+        clauses.append(f"EXISTS (SELECT 1 FROM assets a WHERE a.tag = releases.tag AND {' AND '.join(asset_clauses)})")
+
+    results = []
+    with contextlib.closing(_open_release_index()) as db:
+        query = f"SELECT * FROM releases {'WHERE ' + ' AND '.join(clauses) if clauses else ''} ORDER BY number DESC"
+        for row in db.execute(query, params):
+            release = _release_from_rows(row, db.execute(
+                "SELECT name, size, digest, content_type, url, updated_at FROM assets WHERE tag = ? ORDER BY rowid",
+                (row[0],)))
+            if profile is not None and not rank_assets(build_asset_index(release['assets']), profile):
+                continue
+            results.append(release)
+            if limit and len(results) >= limit:
+                break
+    return results
+
+# Newest indexed release matching a specifier and constraints (see query_releases), or None
+def resolve_version(spec="latest", **constraints):
+    releases = query_releases(spec, limit=1, **constraints)
+    return releases[0] if releases else None
+
+# Resolves a version specifier passed to fetch() to the newest release with a build
+# for the host, syncing the release index first when it is older than LATEST_TTL
+# (or carrying on with the local index when GitHub can't be reached)
+def _resolve_fetch_version(spec, profile):
+    age = release_index_age()
+    if age is None or age > LATEST_TTL:
+        try:
+            sync_release_index()
+        except requests.RequestException as e:
+            if age is None:
+                raise
+            debug_print(f"Couldn't sync the release index ({e}); using the local index.")
+    release = resolve_version(spec, profile=profile)
+    if not release:
+        raise ValueError(f"No release matching {spec} has a build for this system.")
+    debug_print(f"Resolved {spec} to {release['tag_name']}.")
+    return release['tag_name']
 
 def get_system_info():
     debug_print("Detecting system information...")
@@ -58,170 +545,1474 @@ def get_system_info():
     debug_print(f"System: {system}, Architecture: {arch}")
     return system, arch
 
-def get_cuda_version_from_nvidia_smi():
+def _read_text(path):
     try:
-        debug_print("Checking CUDA version using nvidia-smi...")
-        result = subprocess.run(['nvidia-smi'], stdout=subprocess.PIPE, text=True)
-        match = re.search(r'CUDA Version: (\d+\.\d+)', result.stdout)
-        if match:
-            cuda_version = match.group(1)
-            debug_print(f"Detected CUDA version: {cuda_version}")
-            return cuda_version
-    except FileNotFoundError:
-        debug_print("nvidia-smi not found. No NVIDIA GPU detected.")
+        return Path(path).read_text()
+    except OSError:
         return None
-    return None
 
-def get_driver_version_from_nvidia_smi():
+# A root other than / is a fixture describing another host: probes only read its
+# files and never fall back to subprocesses or py-cpuinfo, which see the real host
+def _is_fixture(root):
+    return Path(root or HARDWARE_ROOT) != Path("/")
+
+def probe_cpu_flags(root=None):
+    # Linux fast path: read the flags straight from /proc/cpuinfo ('Features' on ARM)
+    # rather than paying for cpuinfo.get_cpu_info(), which can take about a second
+    text = _read_text(Path(root or HARDWARE_ROOT) / "proc" / "cpuinfo")
+    if text is not None:
+        match = re.search(r'^(?:flags|Features)\s*:\s*(.*)$', text, re.MULTILINE)
+        return sorted(match.group(1).split()) if match else []
+    if _is_fixture(root):
+        return []
+    return sorted(cpuinfo.get_cpu_info().get('flags', []))
+
+def probe_nvidia_driver(root=None, timeout=None):
+    # Linux fast path: the loaded kernel module reports its version under /proc
+    text = _read_text(Path(root or HARDWARE_ROOT) / "proc" / "driver" / "nvidia" / "version")
+    if text is not None:
+        match = re.search(r'Kernel Module(?: for \S+)?\s+(\d+(?:\.\d+)+)', text)
+        return match.group(1) if match else None
+    if _is_fixture(root):
+        return None
     try:
-        debug_print("Checking driver version using nvidia-smi...")
-        result = subprocess.run(['nvidia-smi'], stdout=subprocess.PIPE, text=True)
-        match = re.search(r'Driver Version: (\d+\.\d+)', result.stdout)
-        if match:
-            driver_version = float(match.group(1))
-            debug_print(f"Detected driver version: {driver_version}")
-            return driver_version
-    except FileNotFoundError:
-        debug_print("nvidia-smi not found. No NVIDIA GPU detected.")
+        result = subprocess.run(['nvidia-smi', '--query-gpu=driver_version', '--format=csv,noheader'],
+                                stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True,
+                                timeout=timeout or HARDWARE_PROBE_TIMEOUT)
+    except (FileNotFoundError, subprocess.TimeoutExpired):
         return None
-    return None
+    lines = result.stdout.strip().splitlines()
+    return lines[0].strip() if result.returncode == 0 and lines else None
 
-def check_nvidia_gpu():
-    cuda_version = get_cuda_version_from_nvidia_smi()
-    driver_version = get_driver_version_from_nvidia_smi()
-    has_gpu = cuda_version is not None
-    debug_print(f"NVIDIA GPU detected: {has_gpu}, CUDA version: {cuda_version}, Driver version: {driver_version}")
-    return has_gpu, 'nvidia', cuda_version, driver_version
+def probe_gpu_vendors(root=None, timeout=None):
+    # Linux fast path: display controllers (PCI class 0x03xxxx) listed in sysfs
+    devices = Path(root or HARDWARE_ROOT) / "sys" / "bus" / "pci" / "devices"
+    if devices.is_dir():
+        vendors = set()
+        for device in devices.iterdir():
+            pci_class = _read_text(device / "class") or ""
+            vendor = (_read_text(device / "vendor") or "").strip()
+            if pci_class.startswith("0x03") and vendor in PCI_VENDORS:
+                vendors.add(PCI_VENDORS[vendor])
+        return sorted(vendors)
+    if _is_fixture(root):
+        return []
+    try:
+        result = subprocess.run(['lspci'], stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True,
+                                timeout=timeout or HARDWARE_PROBE_TIMEOUT)
+    except (FileNotFoundError, subprocess.TimeoutExpired):
+        return []
+    vendors = set()
+    for line in result.stdout.splitlines():
+        if re.search(r'VGA|3D|Display', line):
+            vendors.update(name for name in ['nvidia', 'amd', 'intel'] if name in line.lower())
+    return sorted(vendors)
 
-def check_amd_gpu():
+def get_cuda_version_for_driver(driver_version, system):
+    # nvidia-smi --query-gpu can't report the CUDA version, so use the newest CUDA
+    # release the driver is known to support, in the "12.2" form nvidia-smi prints
+    if driver_version is None:
+        return None
+    for cuda_version, drivers in CUDA_DRIVER_MAP.items():
+        required = drivers.get(system)
+        if required and version_parse(driver_version) >= version_parse(required):
+            return '.'.join(cuda_version.split('.')[:2])
+    return None
+
+# The boot time outside Linux, which has a boot ID instead, read exactly from the
+# kernel: SYSTEM_TIMEOFDAY_INFORMATION.BootTime on Windows, kern.boottime on macOS
+# and the BSDs. Empty if neither is available.
+def _boot_time():
     try:
-        debug_print("Checking for AMD GPU using lspci...")
-        result = subprocess.run(['lspci'], stdout=subprocess.PIPE, text=True)
-        if 'AMD' in result.stdout:
-            debug_print("AMD GPU detected.")
-            return True, 'amd', None
-    except FileNotFoundError:
-        debug_print("lspci not found. No AMD GPU detected.")
-        return False, None, None
-    debug_print("No AMD GPU detected.")
-    return False, None, None
-
-def check_avx_support():
-    debug_print("Checking CPU for AVX support...")
-    info = cpuinfo.get_cpu_info()
-    avx = 'avx' in info.get('flags', [])
-    avx2 = 'avx2' in info.get('flags', [])
-    avx512 = 'avx512f' in info.get('flags', [])
-    debug_print(f"AVX: {avx}, AVX2: {avx2}, AVX512: {avx512}")
-    return avx, avx2, avx512
-
-def get_available_cuda_versions(assets):
-    debug_print("Extracting available CUDA versions from assets...")
-    cuda_versions = set()
+        if os.name == 'nt':
+            info = ctypes.create_string_buffer(48)
+            if ctypes.windll.ntdll.NtQuerySystemInformation(3, info, len(info), None) == 0:
+                return str(ctypes.c_int64.from_buffer(info).value)
+        else:
+            boottime, size = ctypes.create_string_buffer(16), ctypes.c_size_t(16)
+            if ctypes.CDLL(None).sysctlbyname(b"kern.boottime", boottime, ctypes.byref(size), None, 0) == 0:
+                return f"{ctypes.c_int64.from_buffer(boottime).value}.{ctypes.c_int32.from_buffer(boottime, 8).value}"
+    except (OSError, AttributeError):
+        pass
+    return ""
+
+# What changes when the NVIDIA driver does: the loaded kernel module's version on
+# Linux, elsewhere the size and modification time of the driver's nvidia-smi and
+# (on Windows) nvml.dll, which a driver update replaces without a reboot
+def _nvidia_driver_signature(root):
+    text = _read_text(root / "proc" / "driver" / "nvidia" / "version")
+    if text is not None or _is_fixture(root):
+        return text or ""
+    paths = [shutil.which("nvidia-smi")]
+    if os.name == 'nt':
+        paths.append(Path(os.environ.get("SystemRoot", r"C:\Windows")) / "System32" / "nvml.dll")
+    signature = []
+    for path in filter(None, paths):
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+        signature.append(f"{path}:{stat.st_size}:{stat.st_mtime_ns}")
+    return "\n".join(signature)
+
+def get_hardware_fingerprint(root=None):
+    root = Path(root or HARDWARE_ROOT)
+    boot_id = (_read_text(root / "proc" / "sys" / "kernel" / "random" / "boot_id") or "").strip()
+    if not boot_id and not _is_fixture(root):
+        boot_id = _boot_time()
+    nvidia_driver = _nvidia_driver_signature(root)
+    system, machine = platform.system().lower(), platform.machine().lower()
+    if _is_fixture(root):
+        # Fixtures are Linux hosts described by procfs; the kernel.arch sysctl is recent,
+        # so fall back to telling x86 ('flags') from ARM ('Features') by /proc/cpuinfo
+        system = (_read_text(root / "proc" / "sys" / "kernel" / "ostype") or "linux").strip().lower()
+        machine = (_read_text(root / "proc" / "sys" / "kernel" / "arch") or "").strip().lower() \
+            or ("aarch64" if re.search(r'^Features\s*:', _read_text(root / "proc" / "cpuinfo") or "", re.MULTILINE)
+                else "x86_64")
+    return {
+        "node": platform.node(),
+        "system": system,
+        "machine": machine,
+        "boot_id": boot_id,
+        "nvidia_driver": hashlib.sha256(nvidia_driver.encode()).hexdigest(),
+    }
+
+# Runs every hardware probe concurrently, each bounded by HARDWARE_PROBE_TIMEOUT,
+# and caches the resulting profile on disk until the host reboots or its NVIDIA
+# driver changes. Point root at a directory laid out like / (see samples/hardware)
+# to probe a fixture instead of the real machine.
+def get_hardware_profile(use_cache=True, root=None, timeout=None):
+    timeout = timeout or HARDWARE_PROBE_TIMEOUT
+    fingerprint = get_hardware_fingerprint(root)
+    cache_path = Path(CACHE_DIR) / "hardware.json" if use_cache and CACHE_DIR else None
+    cached = _read_json(cache_path) if cache_path else None
+    if cached and cached.get("fingerprint") == fingerprint:
+        debug_print("Using cached hardware profile.")
+        return cached["profile"]
+
+    debug_print("Detecting hardware...")
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=3)
+    probes = {
+        "cpu_flags": (executor.submit(probe_cpu_flags, root), []),
+        "nvidia_driver": (executor.submit(probe_nvidia_driver, root, timeout), None),
+        "gpu_vendors": (executor.submit(probe_gpu_vendors, root, timeout), []),
+    }
+    results = {}
+    deadline = time.monotonic() + timeout
+    for name, (future, default) in probes.items():
+        try:
+            results[name] = future.result(timeout=max(deadline - time.monotonic(), 0))
+        except Exception as e:
+            debug_print(f"Hardware probe {name} failed or timed out: {e!r}")
+            results[name] = default
+    executor.shutdown(wait=False)
+
+    system, arch = fingerprint["system"], fingerprint["machine"]
+    driver_version = results["nvidia_driver"]
+    flags = set(results["cpu_flags"])
+    if driver_version:
+        gpu_vendor = 'nvidia'
+    elif 'amd' in results["gpu_vendors"]:
+        gpu_vendor = 'amd'
+    else:
+        gpu_vendor = None
+    profile = {
+        "system": system,
+        "arch": arch,
+        "has_gpu": gpu_vendor is not None,
+        "gpu_vendor": gpu_vendor,
+        "gpu_vendors": results["gpu_vendors"],
+        "cuda_version": get_cuda_version_for_driver(driver_version, system),
+        "driver_version": driver_version,
+        "avx": 'avx' in flags,
+        "avx2": 'avx2' in flags,
+        "avx512": 'avx512f' in flags,
+    }
+    debug_print(f"Hardware profile: {profile}")
+
+    # Don't cache a profile built from probes that didn't finish
+    if cache_path and all(future.done() and not future.exception() for future, _ in probes.values()):
+        _write_json(cache_path, {"fingerprint": fingerprint, "profile": profile})
+    return profile
+
+# Release asset names look like llama-b3088-bin-win-cuda-cu12.2.0-x64.zip: the OS,
+# then any of backend, CUDA version, ISA level and toolchain, then the architecture
+ASSET_NAME_PATTERN = re.compile(
+    r'^(?P<kind>llama|cudart-llama)-(?:(?P<tag>b\d+)-)?bin-(?P<os>win|ubuntu|linux|macos)-(?P<variant>.+?)\.(?:zip|tar\.gz)$'
+)
+CUDA_TOKEN_PATTERN = re.compile(r'^cu(\d+\.\d+(?:\.\d+)?)$')
+ASSET_OS_NAMES = {'win': 'windows', 'ubuntu': 'linux', 'linux': 'linux', 'macos': 'darwin'}
+ARCH_NAMES = {'x64': 'x86_64', 'x86_64': 'x86_64', 'amd64': 'x86_64', 'arm64': 'arm64', 'aarch64': 'arm64'}
+ASSET_ISA_LEVELS = ['noavx', 'avx', 'avx2', 'avx512']
+ASSET_TOOLCHAINS = {'llvm', 'msvc'}
+
+# Relative speed of each compatible build; selection ranks by score, then toolchain
+# and CUDA version. CPU builds score by ISA level, and GPU backends beat any CPU
+# build when the host has a matching GPU. rpc builds are never selected.
+ASSET_BACKEND_SCORES = {'cuda': 100, 'hip': 90, 'sycl': 60, 'vulkan': 50, 'kompute': 40, 'metal': 30}
+ASSET_ISA_SCORES = {None: 15, 'noavx': 10, 'avx': 20, 'avx2': 30, 'avx512': 40}
+ASSET_OPENBLAS_SCORE = 25
+# Parsed asset names kept for reuse: enough for the few releases a process ranks,
+# without growing with every asset a release index sync walks through
+ASSET_NAME_CACHE_SIZE = 1024
+
+@functools.lru_cache(maxsize=ASSET_NAME_CACHE_SIZE)
+def parse_asset_name(name):
+    match = ASSET_NAME_PATTERN.match(name)
+    if not match:
+        return None
+    tokens = match.group('variant').split('-')
+    record = {
+        "name": name,
+        "kind": 'cudart' if match.group('kind') == 'cudart-llama' else 'build',
+        "tag": match.group('tag'),
+        "os": ASSET_OS_NAMES[match.group('os')],
+        "arch": ARCH_NAMES.get(tokens[-1], tokens[-1]),
+        "backend": 'cpu',
+        "cuda_version": None,
+        "isa": None,
+        "toolchain": None,
+    }
+    for token in tokens[:-1]:
+        cuda_match = CUDA_TOKEN_PATTERN.match(token)
+        if cuda_match:
+            record['backend'], record['cuda_version'] = 'cuda', cuda_match.group(1)
+        elif token in ASSET_ISA_LEVELS:
+            record['isa'] = token
+        elif token in ASSET_TOOLCHAINS:
+            record['toolchain'] = token
+        elif token == 'amd':
+            record['backend'] = 'hip'
+        elif token != 'cuda':
+            record['backend'] = token
+    if record['os'] == 'darwin' and record['arch'] == 'arm64':
+        record['backend'] = 'metal'
+    return record
+
+# Rewrites a GitHub asset download URL to DOWNLOAD_BASE_URL when a mirror is configured
+def mirror_asset_url(url):
+    if not DOWNLOAD_BASE_URL:
+        return url
+    return DOWNLOAD_BASE_URL + urllib.parse.urlsplit(url).path
+
+# Parses every asset of a release once into compact records that selection can rank
+def build_asset_index(assets):
+    index = []
     for asset in assets:
-        match = re.search(r'cu(\d+\.\d+\.\d+)', asset['name'])
-        if match:
-            cuda_versions.add(match.group(1))
-    sorted_versions = sorted(cuda_versions, reverse=True)
-    debug_print(f"Available CUDA versions: {sorted_versions}")
-    return sorted_versions
+        record = parse_asset_name(asset['name'])
+        if record:
+            index.append(dict(record, url=mirror_asset_url(asset['browser_download_url']), size=asset.get('size'),
+                              digest=asset.get('digest')))
+    return index
+
+# Scores an indexed asset for a host profile (as returned by get_hardware_profile);
+# returns None when the build can't run on that host
+def score_asset(record, profile):
+    if record['kind'] != 'build' or record['os'] != profile['system'] \
+            or record['arch'] != ARCH_NAMES.get(profile['arch'], profile['arch']):
+        return None
+
+    isa = record['isa']
+    flags = {'noavx': True, 'avx': profile['avx'], 'avx2': profile['avx2'], 'avx512': profile['avx512']}
+    if isa and not flags[isa]:
+        return None
+
+    backend = record['backend']
+    gpu_vendors = set(profile.get('gpu_vendors') or []) | ({profile['gpu_vendor']} if profile.get('gpu_vendor') else set())
+    if backend == 'cpu':
+        return ASSET_ISA_SCORES[isa]
+    if backend == 'openblas':
+        return ASSET_OPENBLAS_SCORE if profile['avx2'] else None
+    if backend == 'metal':
+        return ASSET_BACKEND_SCORES['metal']
+    if backend == 'cuda':
+        required = CUDA_DRIVER_MAP.get(record['cuda_version'], {}).get(profile['system'])
+        driver_version = profile.get('driver_version')
+        if 'nvidia' not in gpu_vendors or not required or driver_version is None \
+                or version_parse(str(driver_version)) < version_parse(required):
+            return None
+        return ASSET_BACKEND_SCORES['cuda']
+    if backend == 'hip':
+        return ASSET_BACKEND_SCORES['hip'] if 'amd' in gpu_vendors else None
+    if backend == 'sycl':
+        return ASSET_BACKEND_SCORES['sycl'] if 'intel' in gpu_vendors else None
+    if backend in ('vulkan', 'kompute'):
+        return ASSET_BACKEND_SCORES[backend] if gpu_vendors else None
+    return None
+
+# Returns the compatible assets for a host profile, fastest first
+def rank_assets(index, profile):
+    scored = []
+    for position, record in enumerate(index):
+        score = score_asset(record, profile)
+        if score is not None:
+            cuda_version = version_parse(record['cuda_version'] or '0')
+            scored.append(((score, record['toolchain'] == 'llvm', cuda_version, -position), record))
+    return [record for _, record in sorted(scored, key=lambda item: item[0], reverse=True)]
+
+def _profile_key(profile):
+    return (profile['system'], profile['arch'], profile.get('gpu_vendor'), tuple(sorted(profile.get('gpu_vendors') or [])),
+            str(profile.get('driver_version')), profile['avx'], profile['avx2'], profile['avx512'])
+
+# Resolves many host profiles against one release in a single pass, for fleet
+# planning; hosts with identical capabilities share one ranking. Returns the best
+# asset record (or None) for each profile, in order.
+def resolve_assets(assets, profiles):
+    index = build_asset_index(assets)
+    resolved = {}
+    results = []
+    for profile in profiles:
+        key = _profile_key(profile)
+        if key not in resolved:
+            ranking = rank_assets(index, profile)
+            resolved[key] = ranking[0] if ranking else None
+        results.append(resolved[key])
+    return results
 
 def select_best_asset(assets, system, arch, gpu_vendor, driver_version, avx, avx2, avx512):
     debug_print("Selecting the best asset for the system...")
-    patterns = {
-        'linux': {
-            'nvidia': re.compile(r'.*ubuntu-x64.*\.zip'),
-            'amd': re.compile(r'.*ubuntu-x64.*\.zip'),
-            'none': re.compile(r'.*ubuntu-x64.*\.zip')
-        },
-        'darwin': {
-            'none': re.compile(r'.*macos-(arm64|x64)\.zip')
-        },
-        'windows': {
-            'nvidia': re.compile(r'.*win-cuda-cu(\d+\.\d+\.\d+)-x64\.zip'),
-            'amd': re.compile(r'.*win-amd-x64\.zip'),
-            'none': re.compile(r'.*win-(avx|avx2|avx512|noavx|openblas|rpc|sycl|vulkan)-x64\.zip')
-        }
+    profile = {
+        "system": system, "arch": arch, "gpu_vendor": gpu_vendor, "gpu_vendors": [gpu_vendor] if gpu_vendor else [],
+        "driver_version": driver_version, "avx": avx, "avx2": avx2, "avx512": avx512,
     }
-    
-    available_cuda_versions = get_available_cuda_versions(assets)
-    
-    for cuda_version in available_cuda_versions:
-        required_driver_version = CUDA_DRIVER_MAP.get(cuda_version, {}).get(system, 'inf')
-        debug_print(f"Checking CUDA version {cuda_version} which requires driver version {required_driver_version}")
-        if driver_version is not None and version_parse(str(driver_version)) >= version_parse(required_driver_version):
-            debug_print(f"Driver version {driver_version} is sufficient for CUDA version {cuda_version}")
-            for asset in assets:
-                if patterns[system][gpu_vendor].match(asset['name']):
-                    asset_cuda_version = re.search(r'cu(\d+\.\d+\.\d+)', asset['name'])
-                    if asset_cuda_version and asset_cuda_version.group(1) == cuda_version:
-                        debug_print(f"Selected asset: {asset['name']} for CUDA version {cuda_version}")
-                        return asset['browser_download_url']
+    ranking = rank_assets(build_asset_index(assets), profile)
+    debug_print(f"Compatible assets, fastest first: {[record['name'] for record in ranking]}")
+    if not ranking:
+        debug_print("No suitable asset found.")
+        return None
+    debug_print(f"Selected asset: {ranking[0]['name']}")
+    return ranking[0]['url']
+
+class IncompleteDownloadError(requests.RequestException):
+    pass
+
+class FetchCancelled(Exception):
+    pass
+
+def _check_cancelled(cancel):
+    if cancel is not None and cancel.is_set():
+        raise FetchCancelled("Fetch was cancelled")
+
+def _is_retryable(error):
+    if isinstance(error, requests.HTTPError):
+        status = error.response.status_code if error.response is not None else None
+        return status is not None and (status == 429 or status >= 500)
+    return isinstance(error, (requests.ConnectionError, requests.Timeout,
+                              requests.exceptions.ChunkedEncodingError, IncompleteDownloadError))
+
+def _content_range_total(response):
+    # Content-Range: bytes 100-199/200 (or bytes */200 on a 416 response)
+    match = re.search(r'/(\d+)$', response.headers.get('Content-Range', ''))
+    return int(match.group(1)) if match else None
+
+# Bounded read-only view of part of a file, used as the raw stream of file:// responses
+class _FileSlice(io.RawIOBase):
+    def __init__(self, file, length):
+        self.file = file
+        self.remaining = length
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        view = memoryview(buffer)[:self.remaining]
+        count = self.file.readinto(view)
+        self.remaining -= count
+        return count
+
+    def close(self):
+        self.file.close()
+        super().close()
+
+# Serves file:// URLs through requests, with HEAD and single Range support, so
+# mirrors on a local or network filesystem behave like plain HTTP ones
+class FileAdapter(requests.adapters.BaseAdapter):
+    def send(self, request, stream=False, timeout=None, verify=True, cert=None, proxies=None):
+        response = requests.Response()
+        response.request, response.url = request, request.url
+        response.raw = io.BytesIO(b'')
+        path = Path(urllib.request.url2pathname(urllib.parse.urlsplit(request.url).path))
+        if request.method not in ('GET', 'HEAD'):
+            response.status_code, response.reason = 405, "Method Not Allowed"
+            return response
+        try:
+            stat = path.stat()
+            if not path.is_file():
+                raise FileNotFoundError(path)
+        except (FileNotFoundError, NotADirectoryError):
+            response.status_code, response.reason = 404, "Not Found"
+            return response
+        except PermissionError:
+            response.status_code, response.reason = 403, "Forbidden"
+            return response
+
+        size = stat.st_size
+        start, end = 0, size - 1
+        response.status_code, response.reason = 200, "OK"
+        match = re.match(r'bytes=(\d*)-(\d*)$', request.headers.get('Range', ''))
+        if match and (match.group(1) or match.group(2)):
+            if match.group(1):
+                start = int(match.group(1))
+                end = min(int(match.group(2)), size - 1) if match.group(2) else size - 1
+            else:
+                start = max(size - int(match.group(2)), 0)
+            if start >= size or start > end:
+                response.status_code, response.reason = 416, "Range Not Satisfiable"
+                response.headers['Content-Range'] = f'bytes */{size}'
+                return response
+            response.status_code, response.reason = 206, "Partial Content"
+            response.headers['Content-Range'] = f'bytes {start}-{end}/{size}'
+        response.headers['Content-Length'] = str(end + 1 - start)
+        response.headers['Accept-Ranges'] = 'bytes'
+        response.headers['Last-Modified'] = email.utils.formatdate(stat.st_mtime, usegmt=True)
+        if request.method == 'GET':
+            file = open(path, 'rb')
+            file.seek(start)
+            response.raw = _FileSlice(file, end + 1 - start)
+        return response
+
+    def close(self):
+        pass
+
+# Session with a connection pool sized for the given concurrency and file:// support
+def _new_session(connections=1):
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=max(connections, 1))
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    session.mount('file://', FileAdapter())
+    return session
+
+# Streams url to file_path via a sibling '.part' file, resuming from its current size
+# with an HTTP Range request after a dropped connection or a restart, and retrying
+# transient failures with exponential backoff. progress(phase, done, total) is called
+# as chunks arrive; setting the cancel event aborts and removes the partial file.
+def download_file(url, file_path, chunk_size=DOWNLOAD_CHUNK_SIZE, retries=DOWNLOAD_RETRIES,
+                  backoff=DOWNLOAD_BACKOFF, timeout=DOWNLOAD_TIMEOUT, session=None, progress=None, cancel=None):
+    file_path = Path(file_path)
+    part_path = file_path.with_name(file_path.name + '.part')
+    try:
+        _download_to_part(url, part_path, chunk_size, retries, backoff, timeout, session, progress, cancel)
+    except FetchCancelled:
+        _unlink_if_exists(part_path)
+        raise
+
+    part_path.replace(file_path)
+    debug_print(f"Downloaded asset to {file_path}")
+    return file_path
+
+def _download_to_part(url, part_path, chunk_size, retries, backoff, timeout, session, progress, cancel):
+    if session is None:
+        with _new_session() as session:
+            return _download_to_part(url, part_path, chunk_size, retries, backoff, timeout, session, progress, cancel)
+    attempt = 0
+
+    while True:
+        _check_cancelled(cancel)
+        offset = part_path.stat().st_size if part_path.exists() else 0
+        headers = {'Range': f'bytes={offset}-'} if offset else {}
+        try:
+            with session.get(url, headers=headers, stream=True, timeout=timeout) as response:
+                if offset and response.status_code == 416:
+                    # Nothing left to fetch if the partial file already holds every byte
+                    if _content_range_total(response) == offset:
+                        debug_print(f"Partial download {part_path} is already complete.")
+                        return
+                    debug_print(f"Partial download {part_path} is invalid; restarting from the beginning.")
+                    part_path.unlink()
+                    continue
+                response.raise_for_status()
+
+                if offset and response.status_code == 206:
+                    debug_print(f"Resuming download at byte {offset}...")
+                    total = _content_range_total(response)
+                    mode = 'ab'
+                else:
+                    if offset:
+                        debug_print("Server ignored the Range request; restarting from the beginning.")
+                    offset = 0
+                    length = response.headers.get('Content-Length')
+                    total = int(length) if length and 'Content-Encoding' not in response.headers else None
+                    mode = 'wb'
+
+                done = offset
+                with open(part_path, mode) as file:
+                    for chunk in response.iter_content(chunk_size=chunk_size):
+                        _check_cancelled(cancel)
+                        file.write(chunk)
+                        done += len(chunk)
+                        if progress:
+                            progress("download", done, total)
+
+            size = part_path.stat().st_size
+            if total is not None and size < total:
+                raise IncompleteDownloadError(f"Received {size} of {total} bytes")
+            return
+        except requests.RequestException as e:
+            attempt += 1
+            if not _is_retryable(e) or attempt > retries:
+                raise
+            delay = backoff * 2 ** (attempt - 1)
+            debug_print(f"Download interrupted ({e}); retrying in {delay:.1f}s ({attempt}/{retries})...")
+            time.sleep(delay)
+
+def _download_segment(session, url, file_path, start, end, chunk_size, retries, backoff, timeout,
+                      progress=None, cancel=None, stop=None):
+    attempt = 0
+    while True:
+        _check_cancelled(cancel)
+        _check_cancelled(stop)
+        try:
+            headers = {'Range': f'bytes={start}-{end}'}
+            with session.get(url, headers=headers, stream=True, timeout=timeout) as response:
+                response.raise_for_status()
+                if response.status_code != 206:
+                    raise IncompleteDownloadError(f"Server ignored Range request for bytes {start}-{end}")
+                with open(file_path, 'r+b') as file:
+                    file.seek(start)
+                    for chunk in response.iter_content(chunk_size=chunk_size):
+                        _check_cancelled(cancel)
+                        _check_cancelled(stop)
+                        # Never write past the end of this segment into the next one
+                        chunk = chunk[:end + 1 - start]
+                        file.write(chunk)
+                        # Flush before reporting so recorded progress never runs ahead of the file
+                        file.flush()
+                        start += len(chunk)
+                        if progress:
+                            progress(start, len(chunk))
+            if start <= end:
+                raise IncompleteDownloadError(f"Segment ended {end + 1 - start} bytes short")
+            return
+        except requests.RequestException as e:
+            attempt += 1
+            if not _is_retryable(e) or attempt > retries:
+                raise
+            delay = backoff * 2 ** (attempt - 1)
+            debug_print(f"Segment interrupted ({e}); retrying from byte {start} in {delay:.1f}s ({attempt}/{retries})...")
+            time.sleep(delay)
+
+# Splits the asset into byte ranges fetched concurrently over a pooled session and
+# written in place into a preallocated file, falling back to a single resumable
+# stream when the server does not advertise range support. A .segments.json sidecar
+# records how far each range got, so a failed or killed download resumes only the
+# missing bytes as long as the asset is unchanged (same size, ETag and Last-Modified).
+def download_file_segmented(url, file_path, connections=DOWNLOAD_CONNECTIONS,
+                            min_segment_size=DOWNLOAD_MIN_SEGMENT_SIZE, chunk_size=DOWNLOAD_CHUNK_SIZE,
+                            retries=DOWNLOAD_RETRIES, backoff=DOWNLOAD_BACKOFF, timeout=DOWNLOAD_TIMEOUT,
+                            progress=None, cancel=None):
+    file_path = Path(file_path)
+    with _new_session(connections) as session:
+        size, source_url, validator = None, url, None
+        if connections > 1:
+            # Resolve redirects once (GitHub sends assets to a CDN) so segments go straight there
+            response = session.head(url, allow_redirects=True, timeout=timeout)
+            length = response.headers.get('Content-Length')
+            if response.ok and response.headers.get('Accept-Ranges', '').lower() == 'bytes' and length:
+                url = response.url
+                size = int(length)
+                validator = [response.headers.get('ETag'), response.headers.get('Last-Modified')]
+
+        segments = min(connections, math.ceil(size / min_segment_size)) if size else 1
+        if segments <= 1:
+            debug_print("Segmented download not possible or not worthwhile; using a single stream.")
+            return download_file(url, file_path, chunk_size=chunk_size, retries=retries, backoff=backoff,
+                                 timeout=timeout, session=session, progress=progress, cancel=cancel)
+
+        segment_path = file_path.with_name(file_path.name + '.segments')
+        state_path = file_path.with_name(file_path.name + '.segments.json')
+        state = _read_json(state_path) if segment_path.exists() else None
+        if state and state.get('url') == source_url and state.get('size') == size \
+                and state.get('validator') == validator and segment_path.stat().st_size == size:
+            debug_print(f"Resuming segmented download from {state_path}...")
         else:
-            debug_print(f"Driver version {driver_version} is not sufficient or not detected for CUDA version {cuda_version}")
-    
-    # If no compatible CUDA version is found, fall back to CPU-only option
-    debug_print("No compatible CUDA version found. Falling back to CPU-only option.")
-    for asset in assets:
-        if patterns[system]['none'].match(asset['name']):
-            debug_print(f"Selected CPU-only asset: {asset['name']}")
-            return asset['browser_download_url']
-    
-    debug_print("No suitable asset found.")
+            # Each range is [next byte to fetch, last byte]
+            segment_size = math.ceil(size / segments)
+            state = {"url": source_url, "size": size, "validator": validator,
+                     "ranges": [[start, min(start + segment_size, size) - 1] for start in range(0, size, segment_size)]}
+            with open(segment_path, 'wb') as file:
+                file.truncate(size)
+            _write_json(state_path, state)
+
+        ranges = state['ranges']
+        pending = [position for position, (start, end) in enumerate(ranges) if start <= end]
+        received = {"bytes": size - sum(end + 1 - start for start, end in ranges if start <= end),
+                    "saved_at": time.monotonic(), "lock": threading.Lock()}
+        debug_print(f"Downloading {size - received['bytes']} of {size} bytes in {len(pending)} segments...")
+
+        def save_state():
+            _write_json(state_path, state)
+            received["saved_at"] = time.monotonic()
+
+        def segment_progress(position, next_byte, length):
+            with received["lock"]:
+                ranges[position][0] = next_byte
+                received["bytes"] += length
+                if time.monotonic() - received["saved_at"] > SEGMENT_STATE_INTERVAL:
+                    save_state()
+                if progress:
+                    progress("download", received["bytes"], size)
+
+        # A segment that fails for good stops the others rather than letting them
+        # run to completion before the error surfaces
+        stop = threading.Event()
+        error = None
+        try:
+            with concurrent.futures.ThreadPoolExecutor(max_workers=max(len(pending), 1)) as executor:
+                futures = [
+                    executor.submit(_download_segment, session, url, segment_path, ranges[position][0],
+                                    ranges[position][1], chunk_size, retries, backoff, timeout,
+                                    functools.partial(segment_progress, position), cancel, stop)
+                    for position in pending
+                ]
+                try:
+                    for future in concurrent.futures.as_completed(futures):
+                        try:
+                            future.result()
+                        except BaseException as e:
+                            if error is None:
+                                error = e
+                                stop.set()
+                except BaseException:
+                    # Interrupted while waiting (e.g. Ctrl-C): don't wait for every segment
+                    stop.set()
+                    raise
+            if error is not None:
+                raise error
+        except FetchCancelled:
+            # Cancelled on purpose: leave nothing behind
+            _unlink_if_exists(segment_path)
+            _unlink_if_exists(state_path)
+            raise
+        except BaseException:
+            with received["lock"]:
+                save_state()
+            raise
+
+    segment_path.replace(file_path)
+    _unlink_if_exists(state_path)
+    debug_print(f"Downloaded asset to {file_path}")
+    return file_path
+
+def _try_lock(fd):
+    try:
+        if os.name == 'nt':
+            os.lseek(fd, 0, os.SEEK_SET)
+            msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+        else:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        return True
+    except OSError:
+        return False
+
+def _unlock(fd):
+    if os.name == 'nt':
+        os.lseek(fd, 0, os.SEEK_SET)
+        msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+    else:
+        fcntl.flock(fd, fcntl.LOCK_UN)
+
+# Cross-process exclusive lock on path. The lock is an OS advisory lock (flock, or
+# msvcrt.locking on Windows) that the kernel drops when its holder exits, so a
+# crashed holder can never leave a stale lock behind; the lock file itself is just
+# left in place and records the current holder. Unlike file_lock it isn't tied to
+# a thread, so it can be acquired in an executor and released from an event loop.
+class FileLock:
+    def __init__(self, path, timeout=LOCK_TIMEOUT, poll_interval=LOCK_POLL_INTERVAL):
+        self.path = Path(path)
+        self.timeout = timeout
+        self.poll_interval = poll_interval
+        self.fd = None
+
+    def acquire(self, cancel=None):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o666)
+        try:
+            deadline = time.monotonic() + self.timeout if self.timeout is not None else None
+            waiting = False
+            while not _try_lock(fd):
+                _check_cancelled(cancel)
+                if not waiting:
+                    holder = _read_text(self.path) if os.name != 'nt' else None
+                    debug_print(f"Waiting for {self.path} (held by {holder or 'another process'})...")
+                    waiting = True
+                if deadline is not None and time.monotonic() > deadline:
+                    raise TimeoutError(f"Timed out after {self.timeout}s waiting for {self.path}")
+                time.sleep(self.poll_interval)
+            if os.name != 'nt':
+                os.ftruncate(fd, 0)
+                os.write(fd, json.dumps({"pid": os.getpid(), "host": platform.node(), "since": time.time()}).encode())
+        except BaseException:
+            os.close(fd)
+            raise
+        self.fd = fd
+        return self
+
+    def release(self):
+        if self.fd is None:
+            return
+        fd, self.fd = self.fd, None
+        try:
+            _unlock(fd)
+        finally:
+            os.close(fd)
+
+    def __enter__(self):
+        return self.acquire()
+
+    def __exit__(self, *exc_info):
+        self.release()
+
+# FileLock on path, reentrant within a thread
+@contextlib.contextmanager
+def file_lock(path, timeout=LOCK_TIMEOUT, poll_interval=LOCK_POLL_INTERVAL):
+    held = _held_locks.__dict__.setdefault("paths", set())
+    key = os.path.abspath(path)
+    if key in held:
+        yield
+        return
+
+    with FileLock(path, timeout, poll_interval):
+        held.add(key)
+        try:
+            yield
+        finally:
+            held.discard(key)
+
+def file_sha256(file_path, chunk_size=DOWNLOAD_CHUNK_SIZE):
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as file:
+        for chunk in iter(lambda: file.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def _artifact_dir(cache_dir=None):
+    return Path(cache_dir or CACHE_DIR) / "artifacts"
+
+def _load_cache_index(cache_dir=None):
+    try:
+        return json.loads((_artifact_dir(cache_dir) / "index.json").read_text())
+    except (FileNotFoundError, ValueError):
+        return {}
+
+def _save_cache_index(index, cache_dir=None):
+    _write_json(_artifact_dir(cache_dir) / "index.json", index)
+
+def _cache_key(name, size, digest):
+    return f"{name}:{size}:{digest or ''}"
+
+def _cache_blob_path(entry, cache_dir=None):
+    return _artifact_dir(cache_dir) / entry['sha256'] / entry['name']
+
+def _cache_lock(cache_dir=None):
+    return file_lock(_artifact_dir(cache_dir) / ".lock")
+
+def cache_lookup(name, size=None, digest=None, cache_dir=None):
+    with _cache_lock(cache_dir):
+        index = _load_cache_index(cache_dir)
+        for key, entry in index.items():
+            if entry['name'] != name or (size is not None and entry['size'] != size) \
+                    or (digest and entry.get('digest') and entry['digest'] != digest):
+                continue
+            blob_path = _cache_blob_path(entry, cache_dir)
+            if not blob_path.exists() or blob_path.stat().st_size != entry['size']:
+                debug_print(f"Cached asset {blob_path} is missing or damaged; dropping it from the cache.")
+                del index[key]
+                _save_cache_index(index, cache_dir)
+                return None
+            entry['last_used'] = time.time()
+            _save_cache_index(index, cache_dir)
+            debug_print(f"Found {name} in the cache at {blob_path}")
+            return blob_path
     return None
 
-def download_and_extract(url, download_dir, extract_dir, delete_after_extraction=True):
+def cache_store(file_path, name, digest=None, cache_dir=None, max_size=None):
+    sha256 = file_sha256(file_path)
+    if digest and digest.startswith('sha256:') and digest.split(':', 1)[1] != sha256:
+        raise ValueError(f"Digest mismatch for {name}: expected {digest}, got sha256:{sha256}")
+
+    size = Path(file_path).stat().st_size
+    entry = {"name": name, "size": size, "digest": digest, "sha256": sha256,
+             "last_used": time.time(), "pinned": False}
+    blob_path = _cache_blob_path(entry, cache_dir)
+    key = _cache_key(name, size, digest)
+    with _cache_lock(cache_dir):
+        blob_path.parent.mkdir(parents=True, exist_ok=True)
+        shutil.move(str(file_path), str(blob_path))
+
+        index = _load_cache_index(cache_dir)
+        entry["pinned"] = index.get(key, {}).get("pinned", False)
+        index[key] = entry
+        _save_cache_index(index, cache_dir)
+        debug_print(f"Stored {name} in the cache at {blob_path}")
+
+        cache_prune(max_size, cache_dir=cache_dir, keep=key)
+    return blob_path
+
+def cache_list(cache_dir=None):
+    entries = list(_load_cache_index(cache_dir).values())
+    return sorted(entries, key=lambda entry: entry['last_used'], reverse=True)
+
+# Evicts unpinned entries, least recently used first, until the cache fits in
+# max_size (CACHE_MAX_SIZE by default); everything=True empties the cache of
+# all unpinned entries. Returns the evicted entries.
+def cache_prune(max_size=None, everything=False, cache_dir=None, keep=None):
+    max_size = CACHE_MAX_SIZE if max_size is None else max_size
+    with _cache_lock(cache_dir):
+        index = _load_cache_index(cache_dir)
+        total = sum(entry['size'] for entry in index.values())
+        evicted = []
+        for key, entry in sorted(index.items(), key=lambda item: item[1]['last_used']):
+            if not everything and total <= max_size:
+                break
+            if entry['pinned'] or key == keep:
+                continue
+            del index[key]
+            total -= entry['size']
+            evicted.append(entry)
+
+        # Blobs are content-addressed, so only remove a blob once no entry refers to it
+        referenced = {entry['sha256'] for entry in index.values()}
+        for entry in evicted:
+            if entry['sha256'] not in referenced:
+                shutil.rmtree(_artifact_dir(cache_dir) / entry['sha256'], ignore_errors=True)
+            debug_print(f"Evicted {entry['name']} from the cache.")
+        if evicted:
+            _save_cache_index(index, cache_dir)
+    return evicted
+
+def cache_pin(name, pinned=True, cache_dir=None):
+    with _cache_lock(cache_dir):
+        index = _load_cache_index(cache_dir)
+        matched = 0
+        for entry in index.values():
+            if entry['name'] == name:
+                entry['pinned'] = pinned
+                matched += 1
+        if matched:
+            _save_cache_index(index, cache_dir)
+    return matched
+
+# Read-only, seekable view of a remote file that zipfile can open directly. The
+# tail (where the zip central directory lives) is fetched once with a suffix Range
+# request; other reads are served from a streamed Range request that is reused as
+# long as reads stay sequential, so each member costs a single request.
+class HTTPRangeFile(io.RawIOBase):
+    def __init__(self, url, session=None, size=None, tail=None, timeout=DOWNLOAD_TIMEOUT, member_offsets=None,
+                 connections=EXTRACT_WORKERS, _stats=None):
+        super().__init__()
+        # Clones share the session, one connection per extraction thread
+        self.session = session or _new_session(connections)
+        self.timeout = timeout
+        self.url = url
+        if size is None:
+            response = self.session.head(url, allow_redirects=True, timeout=timeout)
+            response.raise_for_status()
+            if response.headers.get('Accept-Ranges', '').lower() != 'bytes' or 'Content-Length' not in response.headers:
+                raise IncompleteDownloadError(f"{url} does not support Range requests")
+            self.url = response.url
+            size = int(response.headers['Content-Length'])
+        self.size = size
+        self.tail = tail
+        # Where zip members (and the central directory) start: a read streams only
+        # up to the next one, so no Range request runs past the member being read
+        self.member_offsets = member_offsets or []
+        self.position = 0
+        self._response = None
+        self._stream_position = None
+        self._stream_end = None
+        # Shared with clones so bytes_fetched covers every thread reading the file
+        self._stats = _stats or {"bytes_fetched": 0, "lock": threading.Lock()}
+        # Fetched up front so a server that ignores Range fails here, where the
+        # caller can still fall back to downloading the whole file
+        self._get_tail()
+
+    @property
+    def bytes_fetched(self):
+        return self._stats["bytes_fetched"]
+
+    def _count(self, size):
+        with self._stats["lock"]:
+            self._stats["bytes_fetched"] += size
+
+    def clone(self):
+        return HTTPRangeFile(self.url, self.session, self.size, self.tail, self.timeout,
+                             member_offsets=self.member_offsets, _stats=self._stats)
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self.position
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self.position
+        elif whence == io.SEEK_END:
+            offset += self.size
+        self.position = max(offset, 0)
+        return self.position
+
+    # Streamed, so a server that ignores Range is caught before its body is read
+    def _get_range(self, start, end):
+        response = self.session.get(self.url, headers={'Range': f'bytes={start}-{end}'}, stream=True,
+                                    timeout=self.timeout)
+        if response.status_code != 206:
+            response.close()
+            response.raise_for_status()
+            raise IncompleteDownloadError(f"{self.url} ignored the Range request for bytes {start}-{end}")
+        return response
+
+    def _get_tail(self):
+        if self.tail is None:
+            start = max(self.size - REMOTE_ZIP_TAIL_SIZE, 0)
+            self.tail = self._get_range(start, self.size - 1).content
+            self._count(len(self.tail))
+        return self.tail
+
+    def _close_stream(self):
+        if self._response is not None:
+            self._response.close()
+            self._response = None
+
+    def readinto(self, buffer):
+        if self.position >= self.size:
+            return 0
+        tail_start = self.size - len(self._get_tail())
+        if self.position >= tail_start:
+            data = self.tail[self.position - tail_start:self.position - tail_start + len(buffer)]
+        else:
+            if self._response is None or self._stream_position != self.position \
+                    or self.position >= self._stream_end:
+                self._close_stream()
+                self._stream_end = min(next((offset for offset in self.member_offsets if offset > self.position),
+                                            tail_start), tail_start)
+                self._response = self._get_range(self.position, self._stream_end - 1)
+                self._stream_position = self.position
+            data = self._response.raw.read(min(len(buffer), self._stream_end - self.position))
+            if not data:
+                raise IncompleteDownloadError(f"Unexpected end of stream at byte {self.position}")
+            self._stream_position += len(data)
+            self._count(len(data))
+        buffer[:len(data)] = data
+        self.position += len(data)
+        return len(data)
+
+    def close(self):
+        self._close_stream()
+        super().close()
+
+def expand_include(include):
+    patterns = []
+    for pattern in include:
+        patterns.extend(INCLUDE_PROFILES.get(pattern, [pattern]))
+    return patterns
+
+def _open_zip_source(source):
+    # Each extraction thread needs its own handle on a remote file
+    if isinstance(source, HTTPRangeFile):
+        remote = source.clone()
+        zip_ref = zipfile.ZipFile(remote, 'r')
+        remote.member_offsets = sorted({info.header_offset for info in zip_ref.infolist()} | {zip_ref.start_dir})
+        return zip_ref
+    return zipfile.ZipFile(source, 'r')
+
+def _flattened_member_parts(name):
+    # Release zips keep their binaries in 'build/bin'; install them at the top level
+    parts = PurePosixPath(name).parts
+    if parts[:2] == ('build', 'bin'):
+        parts = parts[2:]
+    return parts
+
+def _unlink_if_exists(path):
     try:
-        debug_print(f"Downloading asset from {url}...")
-        
-        # Ensure the download directory exists
-        download_dir.mkdir(parents=True, exist_ok=True)
-        
-        response = requests.get(url)
-        response.raise_for_status()
-        
-        filename = url.split('/')[-1]
-        file_path = download_dir / filename
-        
-        with open(file_path, 'wb') as file:
-            file.write(response.content)
-        debug_print(f"Downloaded asset to {file_path}")
-        
-        # Ensure the extraction directory exists
-        extract_dir.mkdir(parents=True, exist_ok=True)
-        
-        if file_path.suffix == '.zip':
-            debug_print("Extracting zip file...")
-            with zipfile.ZipFile(file_path, 'r') as zip_ref:
-                zip_ref.extractall(extract_dir)
-            # Check if binaries are in 'build/bin' and move them if necessary
-            build_bin_path = extract_dir / 'build' / 'bin'
-            if build_bin_path.exists():
-                for item in build_bin_path.iterdir():
-                    target_path = extract_dir / item.name
-                    item.rename(target_path)
-                build_bin_path.rmdir()  # Remove the now empty 'bin' directory
-                (extract_dir / 'build').rmdir()  # Remove the now empty 'build' directory
-        elif file_path.suffix in ['.tar', '.gz', '.bz2']:
-            debug_print("Extracting tar file...")
-            with tarfile.open(file_path, 'r:*') as tar_ref:
-                tar_ref.extractall(extract_dir)
-
-        # Set execute permissions for likely binaries on POSIX systems (Linux, Darwin, etc.)
-        if os.name == 'posix':  # Check if running on a POSIX-compliant system
-            non_binary_extensions = {'.txt', '.md', '.json', '.xml'}
-            for item in extract_dir.iterdir():
-                if item.suffix not in non_binary_extensions:
-                    item.chmod(item.stat().st_mode | 0o111)  # Add execute permissions
-            debug_print("Set execute permissions for binaries on POSIX system.")
-
-        # Delete the downloaded file after extraction if the option is enabled
-        if delete_after_extraction:
-            file_path.unlink()
-            debug_print(f"Deleted the downloaded file {file_path}")
+        path.unlink()
+    except FileNotFoundError:
+        pass
+
+# Extracts every member straight to its final, flattened path on a thread pool,
+# creating each file with its permissions (executable for likely binaries on
+# POSIX) so no rename or chmod pass is needed afterwards. With a blob store,
+# members the store already holds are linked in without being read at all.
+def extract_zip(file_path, extract_dir, workers=EXTRACT_WORKERS, include=None, progress=None, cancel=None,
+                store=None):
+    extract_dir = Path(extract_dir)
+    with _open_zip_source(file_path) as zip_ref:
+        infos = [info for info in zip_ref.infolist() if not info.is_dir()]
+
+    patterns = expand_include(include) if include else None
+    targets = []
+    for info in infos:
+        parts = _flattened_member_parts(info.filename)
+        if not parts or PurePosixPath(info.filename).is_absolute() or '..' in parts:
+            debug_print(f"Skipping unsafe zip member {info.filename}")
+            continue
+        if patterns and not any(fnmatch.fnmatch('/'.join(parts), pattern) for pattern in patterns):
+            continue
+        targets.append((info, extract_dir.joinpath(*parts)))
+    for directory in {target.parent for _, target in targets}:
+        directory.mkdir(parents=True, exist_ok=True)
+
+    local = threading.local()
+    handles = []
+    total = sum(info.file_size for info, _ in targets)
+    extracted = {"bytes": 0, "lock": threading.Lock()}
+    catalog = _load_store_catalog(store) if store is not None else None
+    reused = {"files": 0, "bytes": 0, "seconds": 0.0}
+
+    def advance(length):
+        if progress:
+            with extracted["lock"]:
+                extracted["bytes"] += length
+                progress("extract", extracted["bytes"], total)
+
+    def write_member(info, path, mode):
+        if not hasattr(local, 'zip_ref'):
+            local.zip_ref = _open_zip_source(file_path)
+            handles.append(local.zip_ref)
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL | getattr(os, 'O_BINARY', 0), mode)
+        # Hash as the file is written so the install manifest needs no extra read pass
+        digest, size = hashlib.sha256(), 0
+        with os.fdopen(fd, 'wb') as output, local.zip_ref.open(info) as source:
+            for chunk in iter(lambda: source.read(DOWNLOAD_CHUNK_SIZE), b''):
+                _check_cancelled(cancel)
+                output.write(chunk)
+                digest.update(chunk)
+                size += len(chunk)
+                advance(len(chunk))
+        return {"size": size, "sha256": digest.hexdigest()}
+
+    def extract_member(info, target):
+        _check_cancelled(cancel)
+        mode = 0o666  # Subject to the umask, as with zipfile.extractall
+        if os.name == 'posix' and target.parent == extract_dir and target.suffix not in NON_BINARY_EXTENSIONS:
+            mode |= 0o111
+        # Replace rather than overwrite so a running binary is never modified in place
+        _unlink_if_exists(target)
+        if store is None:
+            return write_member(info, target, mode)
+
+        key = _store_member_key(info)
+        with extracted["lock"]:
+            sha256 = catalog["members"].get(key)
+            blob_record = catalog["blobs"].get(sha256, {})
+        blob = _store_blob_path(store, sha256) if sha256 else None
+        if blob and _file_size(blob) == info.file_size:
+            _link_blob(blob, target, mode)
+            with extracted["lock"]:
+                reused["files"] += 1
+                reused["bytes"] += info.file_size
+                reused["seconds"] += blob_record.get("seconds", 0.0)
+            advance(info.file_size)
+            return {"size": info.file_size, "sha256": sha256}
+
+        started = time.perf_counter()
+        tmp_path = store / "tmp" / f"{os.getpid()}-{threading.get_ident()}-{info.header_offset}"
+        try:
+            record = write_member(info, tmp_path, mode)
+            blob = _add_blob(store, tmp_path, record['sha256'])
+        finally:
+            _unlink_if_exists(tmp_path)
+        _link_blob(blob, target, mode)
+        with extracted["lock"]:
+            catalog["members"][key] = record['sha256']
+            catalog["blobs"].setdefault(record['sha256'], {"size": record['size'],
+                                                           "seconds": time.perf_counter() - started})
+        return record
+
+    if store is not None:
+        (store / "tmp").mkdir(parents=True, exist_ok=True)
+    files = {}
+    try:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max(workers, 1)) as executor:
+            futures = {target: executor.submit(extract_member, info, target) for info, target in targets}
+            for target, future in futures.items():
+                files[target.relative_to(extract_dir).as_posix()] = future.result()
+    finally:
+        for handle in handles:
+            handle.close()
+        if store is not None:
+            catalog["reused_files"] = catalog.get("reused_files", 0) + reused["files"]
+            catalog["reused_bytes"] = catalog.get("reused_bytes", 0) + reused["bytes"]
+            catalog["seconds_avoided"] = catalog.get("seconds_avoided", 0.0) + reused["seconds"]
+            _save_store_catalog(store, catalog)
+    debug_print(f"Extracted {len(targets)} files to {extract_dir}")
+    if reused["files"]:
+        debug_print(f"Linked {reused['files']} unchanged files ({reused['bytes']} bytes) from the store, "
+                    f"avoiding {reused['seconds']:.2f}s of extraction.")
+    return files
+
+def extract_archive(file_path, extract_dir, workers=EXTRACT_WORKERS, include=None, progress=None, cancel=None,
+                    store=None):
+    if isinstance(file_path, HTTPRangeFile):
+        debug_print("Extracting selected members from remote zip file...")
+        files = extract_zip(file_path, extract_dir, workers, include, progress, cancel, store)
+        debug_print(f"Fetched {file_path.bytes_fetched} of {file_path.size} bytes.")
+        return files
+    file_path = Path(file_path)
+    if file_path.suffix == '.zip':
+        debug_print("Extracting zip file...")
+        return extract_zip(file_path, extract_dir, workers, include, progress, cancel, store)
+    elif file_path.suffix in ['.tar', '.gz', '.bz2']:
+        debug_print("Extracting tar file...")
+        with tarfile.open(file_path, 'r:*') as tar_ref:
+            tar_ref.extractall(extract_dir)
+        return hash_tree(extract_dir)
+    return {}
+
+def get_store_dir(install_dir=None):
+    return Path(install_dir or EXTRACT_DIR) / "blobs"
+
+def _store_blob_path(store, sha256):
+    return Path(store) / sha256[:2] / sha256
+
+def _load_store_catalog(store):
+    catalog = _read_json(Path(store) / STORE_CATALOG_NAME) or {}
+    catalog.setdefault("members", {})
+    catalog.setdefault("blobs", {})
+    return catalog
+
+def _save_store_catalog(store, catalog):
+    _write_json(Path(store) / STORE_CATALOG_NAME, catalog)
+
+# Zip members are matched to blobs by CRC-32, size and file name, so unchanged
+# files in a new release are linked without being decompressed or hashed
+def _store_member_key(info):
+    return f"{info.CRC:08x}:{info.file_size}:{PurePosixPath(info.filename).name}"
+
+def _file_size(path):
+    try:
+        return path.stat().st_size
+    except OSError:
+        return None
+
+# Moves a freshly extracted file into the store unless an identical blob is
+# already there; blobs are read-only on POSIX as every version shares them
+def _add_blob(store, tmp_path, sha256):
+    blob = _store_blob_path(store, sha256)
+    blob.parent.mkdir(parents=True, exist_ok=True)
+    if os.name == 'posix':
+        os.chmod(tmp_path, os.stat(tmp_path).st_mode & ~0o222)
+    try:
+        os.link(tmp_path, blob)
+    except FileExistsError:
+        pass
+    except OSError:
+        os.replace(tmp_path, blob)
+    return blob
+
+def _reflink(source, target, mode):
+    if not sys.platform.startswith('linux'):
+        return False
+    fd = os.open(target, os.O_WRONLY | os.O_CREAT | os.O_EXCL, mode)
+    try:
+        with open(source, 'rb') as source_file:
+            fcntl.ioctl(fd, FICLONE, source_file.fileno())
+        return True
+    except OSError:
+        os.close(fd)
+        fd = None
+        os.unlink(target)
+        return False
+    finally:
+        if fd is not None:
+            os.close(fd)
+
+# Hardlinks a blob into a version, falling back to a reflink and then a copy where
+# the filesystem can't hardlink. Returns the method used.
+def _link_blob(blob, target, mode):
+    if os.name == 'posix' and mode & 0o111 and not os.stat(blob).st_mode & 0o111:
+        # Executable wherever readable, for every version sharing the blob
+        os.chmod(blob, os.stat(blob).st_mode | (os.stat(blob).st_mode & 0o444) >> 2)
+    try:
+        os.link(blob, target)
+        return "hardlink"
+    except OSError:
+        pass
+    if _reflink(blob, target, mode):
+        return "reflink"
+    fd = os.open(target, os.O_WRONLY | os.O_CREAT | os.O_EXCL | getattr(os, 'O_BINARY', 0), mode)
+    with os.fdopen(fd, 'wb') as output, open(blob, 'rb') as source:
+        shutil.copyfileobj(source, output, DOWNLOAD_CHUNK_SIZE)
+    return "copy"
+
+def _store_blobs(store):
+    return [path for path in Path(store).glob("??/*") if path.is_file()]
+
+# Blobs are in use while any version's manifest lists them (copied or reflinked
+# files included) or while they're hardlinked anywhere outside the store
+def _referenced_blobs(install_dir):
+    referenced = set()
+    versions_dir = Path(install_dir) / "versions"
+    for version in versions_dir.iterdir() if versions_dir.is_dir() else []:
+        manifest = _read_json(version / MANIFEST_NAME) or {}
+        referenced.update(record['sha256'] for record in manifest.get('files', {}).values())
+    return referenced
+
+# Summarises the blob store: blob count and size, the bytes hardlinks save compared
+# with a full copy per version, and cumulative reuse (files and bytes linked
+# instead of extracted, and the extraction time that avoided)
+def store_stats(install_dir=None):
+    store = get_store_dir(install_dir)
+    catalog = _load_store_catalog(store)
+    referenced = _referenced_blobs(install_dir or EXTRACT_DIR)
+    stats = {"blobs": 0, "blob_bytes": 0, "saved_bytes": 0, "unreferenced_bytes": 0,
+             "reused_files": catalog.get("reused_files", 0), "reused_bytes": catalog.get("reused_bytes", 0),
+             "seconds_avoided": catalog.get("seconds_avoided", 0.0)}
+    for blob in _store_blobs(store):
+        stat = blob.stat()
+        stats["blobs"] += 1
+        stats["blob_bytes"] += stat.st_size
+        # One link is the store's own; every further link beyond the first is a copy saved
+        stats["saved_bytes"] += stat.st_size * max(stat.st_nlink - 2, 0)
+        if stat.st_nlink < 2 and blob.name not in referenced:
+            stats["unreferenced_bytes"] += stat.st_size
+    return stats
+
+# Removes blobs no installed version uses. Returns the number removed and bytes freed.
+def store_gc(install_dir=None):
+    install_dir = Path(install_dir or EXTRACT_DIR)
+    store = get_store_dir(install_dir)
+    removed, freed = 0, 0
+    with file_lock(store / ".lock"):
+        referenced = _referenced_blobs(install_dir)
+        catalog = _load_store_catalog(store)
+        for blob in _store_blobs(store):
+            stat = blob.stat()
+            if blob.name in referenced or stat.st_nlink > 1:
+                continue
+            blob.unlink()
+            catalog["blobs"].pop(blob.name, None)
+            removed += 1
+            freed += stat.st_size
+        catalog["members"] = {key: sha256 for key, sha256 in catalog["members"].items() if sha256 in catalog["blobs"]}
+        shutil.rmtree(store / "tmp", ignore_errors=True)
+        _save_store_catalog(store, catalog)
+    debug_print(f"Removed {removed} unreferenced blob(s), freeing {freed} bytes.")
+    return removed, freed
+
+def hash_tree(directory):
+    directory = Path(directory)
+    return {
+        path.relative_to(directory).as_posix(): {"size": path.stat().st_size, "sha256": file_sha256(path)}
+        for path in sorted(directory.rglob('*')) if path.is_file() and path.name != MANIFEST_NAME
+    }
+
+def read_manifest(directory=None):
+    return _read_json(Path(directory or get_active_dir()) / MANIFEST_NAME)
+
+def update_manifest(directory=None, **fields):
+    manifest_path = Path(directory or get_active_dir()) / MANIFEST_NAME
+    manifest = _read_json(manifest_path) or {}
+    manifest.update(fields)
+    _write_json(manifest_path, manifest)
+    return manifest
+
+# Cheap integrity check for the no-op fast path: every file is present with its
+# recorded size. verify_install() re-hashes everything.
+def manifest_files_present(directory, manifest):
+    try:
+        return all((Path(directory) / name).stat().st_size == record['size']
+                   for name, record in manifest['files'].items())
+    except OSError:
+        return False
+
+# Re-hashes every file recorded in the manifest of the active install and returns
+# a {path: problem} dict describing missing, resized or modified files
+def verify_install(directory=None):
+    directory = Path(directory or get_active_dir())
+    manifest = read_manifest(directory)
+    if not manifest:
+        return {MANIFEST_NAME: "missing"}
+    problems = {}
+    for name, record in manifest['files'].items():
+        path = directory / name
+        if not path.is_file():
+            problems[name] = "missing"
+        elif path.stat().st_size != record['size']:
+            problems[name] = "size mismatch"
+        elif file_sha256(path) != record['sha256']:
+            problems[name] = "sha256 mismatch"
+    return problems
+
+def get_active_dir(install_dir=None):
+    return Path(install_dir or EXTRACT_DIR) / "current"
+
+def _point_link(link, target):
+    # Build the new link beside the old one and rename it into place so readers
+    # always see either the old or the new version, never a missing one
+    tmp_link = link.with_name(f".{link.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    _unlink_if_exists(tmp_link)
+    try:
+        os.symlink(target, tmp_link, target_is_directory=True)
+        os.replace(tmp_link, link)
+    except OSError:
+        if os.name != 'nt':
+            raise
+        # Windows without symlink privileges: fall back to a directory junction
+        if link.exists():
+            os.rmdir(link)
+        subprocess.run(['cmd', '/c', 'mklink', '/J', str(link), str(link.parent / target)],
+                       check=True, stdout=subprocess.DEVNULL)
+
+def _link_target(link):
+    try:
+        return Path(os.readlink(link)).name
+    except OSError:
+        return None
+
+def activate_version(version_dir, install_dir=None):
+    install_dir = Path(install_dir or EXTRACT_DIR)
+    current_link, previous_link = install_dir / "current", install_dir / "previous"
+    current = _link_target(current_link)
+    version_name = Path(version_dir).name
+    if current and current != version_name:
+        _point_link(previous_link, Path("versions") / current)
+    _point_link(current_link, Path("versions") / version_name)
+    debug_print(f"Activated {version_name} (previously {current}).")
+
+    # Keep the active and previous versions plus the most recently installed others,
+    # up to KEEP_VERSIONS, then drop blobs no remaining version uses
+    keep = {version_name, _link_target(previous_link)} - {None}
+    versions = sorted((version for version in (install_dir / "versions").iterdir() if not version.name.startswith('.')),
+                      key=lambda version: version.stat().st_mtime, reverse=True)
+    for version in versions:
+        if len(keep) >= KEEP_VERSIONS:
+            break
+        keep.add(version.name)
+    removed = False
+    for version in versions:
+        if version.name not in keep:
+            shutil.rmtree(version, ignore_errors=True)
+            debug_print(f"Removed old version {version.name}")
+            removed = True
+    if removed and get_store_dir(install_dir).is_dir():
+        store_gc(install_dir)
+
+def rollback(install_dir=None):
+    install_dir = Path(install_dir or EXTRACT_DIR)
+    previous = _link_target(install_dir / "previous")
+    if not previous or not (install_dir / "versions" / previous).is_dir():
+        debug_print("No previous version to roll back to.")
+        return None
+    activate_version(install_dir / "versions" / previous, install_dir)
+    return previous
+
+# Extracts the archive into a private staging directory under install_dir/versions
+def stage_archive(file_path, version, install_dir=None, workers=EXTRACT_WORKERS, include=None, manifest=None,
+                  progress=None, cancel=None):
+    versions_dir = Path(install_dir or EXTRACT_DIR) / "versions"
+    staging_dir = versions_dir / f".{version}.staging-{os.getpid()}"
+    shutil.rmtree(staging_dir, ignore_errors=True)
+    staging_dir.mkdir(parents=True)
+    store = get_store_dir(install_dir) if DEDUP_STORE else None
+    try:
+        # The store lock keeps store_gc() from collecting blobs before they're linked
+        with file_lock(store / ".lock") if store else contextlib.nullcontext():
+            files = extract_archive(file_path, staging_dir, workers, include, progress, cancel, store)
+        if manifest is not None:
+            _write_json(staging_dir / MANIFEST_NAME, dict(manifest, files=files, installed_at=time.time()))
+    except BaseException:
+        shutil.rmtree(staging_dir, ignore_errors=True)
+        raise
+    return staging_dir
+
+# Moves a staged install into place as install_dir/versions/<version> and activates it
+def promote_version(staging_dir, version, install_dir=None):
+    install_dir = Path(install_dir or EXTRACT_DIR)
+    versions_dir = install_dir / "versions"
+
+    # Never touch a directory that 'current' or 'previous' points at
+    version_dir = versions_dir / version
+    in_use = {_link_target(install_dir / "current"), _link_target(install_dir / "previous")}
+    if version_dir.name in in_use:
+        version_dir = versions_dir / f"{version}-{int(time.time() * 1000)}"
+    elif version_dir.exists():
+        shutil.rmtree(version_dir)
+    Path(staging_dir).rename(version_dir)
+    activate_version(version_dir, install_dir)
+    return version_dir
+
+def install_archive(file_path, version, install_dir=None, workers=EXTRACT_WORKERS, include=None, manifest=None,
+                    progress=None, cancel=None):
+    staging_dir = stage_archive(file_path, version, install_dir, workers, include, manifest, progress, cancel)
+    return promote_version(staging_dir, version, install_dir)
+
+# Returns a local (possibly cached) copy of the asset, or an HTTPRangeFile when only
+# the members matching include are wanted, along with whether it must be kept
+def obtain_asset(url, download_dir, connections=DOWNLOAD_CONNECTIONS, size=None, digest=None,
+                 use_cache=True, include=None, progress=None, cancel=None):
+    # Ensure the download directory exists
+    download_dir.mkdir(parents=True, exist_ok=True)
+
+    filename = url.split('/')[-1]
+    cached_path = cache_lookup(filename, size, digest) if use_cache and CACHE_DIR else None
+    if cached_path:
+        return cached_path, True
+
+    if include and filename.endswith('.zip'):
+        try:
+            remote_file = HTTPRangeFile(url)
+            debug_print(f"Fetching only the members of {url} matching {include}...")
+            return remote_file, True
+        except requests.RequestException as e:
+            debug_print(f"Selective fetch not possible ({e}); downloading the whole asset.")
+
+    if use_cache and CACHE_DIR:
+        # Download straight into the cache directory, so storing the asset is a
+        # rename rather than a copy across filesystems; the lock keeps processes
+        # sharing the cache from writing the same partial file
+        file_path = _artifact_dir() / "downloads" / filename
+        lock = FileLock(file_path.with_name(f"{filename}.lock"))
+        lock.acquire(cancel)
+        try:
+            cached_path = cache_lookup(filename, size, digest)
+            if cached_path:
+                return cached_path, True
+            debug_print(f"Downloading asset from {url}...")
+            download_file_segmented(url, file_path, connections=connections, progress=progress, cancel=cancel)
+            return cache_store(file_path, filename, digest), True
+        finally:
+            lock.release()
+
+    debug_print(f"Downloading asset from {url}...")
+    file_path = download_dir / filename
+    download_file_segmented(url, file_path, connections=connections, progress=progress, cancel=cancel)
+    return file_path, False
+
+def release_asset(file_path, keep, delete_after_extraction=True):
+    if isinstance(file_path, HTTPRangeFile):
+        file_path.close()
+    # Delete the downloaded file after extraction if the option is enabled
+    # Cached assets are kept for future calls and evicted by the cache itself
+    elif delete_after_extraction and not keep:
+        file_path.unlink()
+        debug_print(f"Deleted the downloaded file {file_path}")
+
+def download_and_extract(url, download_dir, extract_dir, delete_after_extraction=True, connections=DOWNLOAD_CONNECTIONS,
+                         size=None, digest=None, use_cache=True, version=None, include=None, manifest=None,
+                         progress=None, cancel=None):
+    try:
+        file_path, keep = obtain_asset(url, download_dir, connections, size, digest, use_cache, include,
+                                       progress, cancel)
+        try:
+            if version:
+                install_archive(file_path, version, extract_dir, include=include, manifest=manifest,
+                                progress=progress, cancel=cancel)
+            else:
+                # Ensure the extraction directory exists
+                extract_dir.mkdir(parents=True, exist_ok=True)
+                extract_archive(file_path, extract_dir, include=include, progress=progress, cancel=cancel)
+        finally:
+            release_asset(file_path, keep, delete_after_extraction)
 
         debug_print("Extraction complete.")
         return True
+    except FetchCancelled:
+        raise
     except Exception as e:
         debug_print(f"An error occurred: {e}")
         return False
@@ -246,24 +2037,221 @@ def run_binary_with_version(extract_dir, expected_version):
         debug_print(f"Failed to run {binary_name}: {e}")
         return None
 
-def fetch(version="latest"):
+def _binary_path(directory, names):
+    suffix = ".exe" if platform.system().lower() == "windows" else ""
+    for name in names:
+        if (Path(directory) / f"{name}{suffix}").exists():
+            return Path(directory) / f"{name}{suffix}"
+    return None
+
+# Runs a short, fixed token generation workload with the build in directory and
+# returns its throughput in tokens per second, or None if it couldn't be measured
+def benchmark_build(directory, model, tokens=TUNE_TOKENS, timeout=TUNE_TIMEOUT):
+    env = dict(os.environ)
+    for variable in ["LD_LIBRARY_PATH", "DYLD_LIBRARY_PATH"]:
+        env[variable] = os.pathsep.join(filter(None, [str(directory), env.get(variable)]))
+
+    bench = _binary_path(directory, ["llama-bench"])
+    main_binary = _binary_path(directory, ["llama-cli", "main"])
+    try:
+        if bench:
+            result = subprocess.run([str(bench), '-m', str(model), '-p', '0', '-n', str(tokens), '-r', '1', '-o', 'json'],
+                                    stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, timeout=timeout, env=env)
+            runs = json.loads(result.stdout) if result.returncode == 0 else []
+            return max((run['avg_ts'] for run in runs if run.get('n_gen')), default=None)
+        if main_binary:
+            result = subprocess.run([str(main_binary), '-m', str(model), '-n', str(tokens), '-p', 'Hello', '--temp', '0'],
+                                    stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, timeout=timeout, env=env)
+            # llama_print_timings: eval time = ... ( ... ms per token, 123.45 tokens per second)
+            match = re.search(r'\beval time\s*=.*?([\d.]+) tokens per second', result.stderr)
+            return float(match.group(1)) if match else None
+    except (OSError, ValueError, subprocess.TimeoutExpired) as e:
+        debug_print(f"Benchmark in {directory} failed: {e}")
+    return None
+
+def _variant(record):
+    return {key: record[key] for key in ["backend", "cuda_version", "isa", "toolchain"]}
+
+def _profile_hash(profile):
+    return hashlib.sha256(json.dumps(_profile_key(profile)).encode()).hexdigest()
+
+def get_tuning(profile):
+    tuning = _read_json(Path(CACHE_DIR) / "tuning.json") if CACHE_DIR else None
+    return (tuning or {}).get(_profile_hash(profile))
+
+def save_tuning(profile, decision):
+    if not CACHE_DIR:
+        return
+    tuning_path = Path(CACHE_DIR) / "tuning.json"
+    tuning = _read_json(tuning_path) or {}
+    tuning[_profile_hash(profile)] = decision
+    _write_json(tuning_path, tuning)
+
+# Moves the previously tuned variant to the front of the ranking, if it is offered
+def apply_tuning(ranking, profile):
+    decision = get_tuning(profile)
+    if decision:
+        for record in ranking:
+            if _variant(record) == decision['variant']:
+                debug_print(f"Using tuned variant {decision['variant']} for this host.")
+                return [record] + [other for other in ranking if other is not record]
+    return ranking
+
+# Installs each candidate into its own staging directory, benchmarks it and promotes
+# the fastest to install_dir/versions/<version>. Returns the winning record and the
+# measured throughput of every candidate.
+def tune_candidates(candidates, version, model, profile, download_dir=None, install_dir=None, include=None,
+                    manifest=None, progress=None, cancel=None):
+    download_dir = Path(download_dir or DOWNLOAD_DIR)
+    results = {}
+    staged = {}
+    try:
+        for position, record in enumerate(candidates):
+            debug_print(f"Benchmarking {record['name']}...")
+            file_path, keep = obtain_asset(record['url'], download_dir, size=record['size'],
+                                           digest=record['digest'], include=include, progress=progress, cancel=cancel)
+            try:
+                staged[record['name']] = stage_archive(
+                    file_path, f"{version}-tune{position}", install_dir, include=include,
+                    manifest=dict(manifest, asset=record['name'], url=record['url']) if manifest is not None else None,
+                    progress=progress, cancel=cancel)
+            finally:
+                release_asset(file_path, keep)
+            _check_cancelled(cancel)
+            results[record['name']] = benchmark_build(staged[record['name']], model)
+            debug_print(f"{record['name']}: {results[record['name']]} tokens/s")
+
+        measured = [record for record in candidates if results[record['name']]]
+        if not measured:
+            debug_print("No candidate could be benchmarked.")
+            # Remembered like a winner, so later calls take the manifest fast path
+            # instead of installing and benchmarking every candidate again
+            save_tuning(profile, {
+                "variant": None,
+                "asset": None,
+                "model": Path(model).name,
+                "results": results,
+                "measured_at": time.time(),
+            })
+            return None, results
+        winner = max(measured, key=lambda record: results[record['name']])
+        promote_version(staged.pop(winner['name']), version, install_dir)
+        save_tuning(profile, {
+            "variant": _variant(winner),
+            "asset": winner['name'],
+            "model": Path(model).name,
+            "results": results,
+            "measured_at": time.time(),
+        })
+        return winner, results
+    finally:
+        for directory in staged.values():
+            shutil.rmtree(directory, ignore_errors=True)
+
+# Returns the manifest of the active install (or the one in directory) if it already
+# satisfies the request and its files are intact, checked without hashing, network
+# access or subprocesses
+def _matching_install(profile, include, tag=None, asset_name=None, directory=None):
+    directory = directory or get_active_dir()
+    manifest = read_manifest(directory)
+    if not manifest or not manifest.get('observed_version') \
+            or manifest.get('profile') != _profile_hash(profile) \
+            or manifest.get('include') != (sorted(include) if include else None) \
+            or (tag and manifest.get('tag') != tag) or (asset_name and manifest.get('asset') != asset_name):
+        return None
+    if not manifest_files_present(directory, manifest):
+        debug_print("Installed files don't match the manifest; reinstalling.")
+        return None
+    return manifest
+
+# Turns progress(phase, done, total) calls from worker threads into event dicts with
+# throughput and ETA, delivered on the event loop to a callable or an asyncio.Queue
+class _ProgressReporter:
+    def __init__(self, loop, sink, interval=PROGRESS_INTERVAL):
+        self.loop = loop
+        self.sink = sink
+        self.interval = interval
+        self.lock = threading.Lock()
+        self.phase = None
+        self.started = self.last = 0.0
+
+    def __call__(self, phase, done=0, total=None):
+        now = time.monotonic()
+        with self.lock:
+            if phase != self.phase:
+                self.phase, self.started = phase, now
+            elif now - self.last < self.interval and done != total:
+                return
+            self.last = now
+            elapsed = now - self.started
+        throughput = done / elapsed if elapsed > 0 and done else None
+        event = {
+            "phase": phase,
+            "bytes_done": done,
+            "bytes_total": total,
+            "throughput": throughput,
+            "eta": (total - done) / throughput if throughput and total is not None else None,
+        }
+        if self.sink is None:
+            return
+        try:
+            self.loop.call_soon_threadsafe(self._deliver, event)
+        except RuntimeError:
+            pass  # The loop has already closed
+
+    def _deliver(self, event):
+        if isinstance(self.sink, asyncio.Queue):
+            self.sink.put_nowait(event)
+        else:
+            self.sink(event)
+
+# Runs a blocking call on the default executor. If the awaiting task is cancelled the
+# call is told to stop through the cancel event and awaited, so whatever it cleans
+# up (partial downloads, staging directories, locks) is gone before the task ends.
+async def _offload(cancel_event, func, *args, **kwargs):
+    future = asyncio.get_running_loop().run_in_executor(None, functools.partial(func, *args, **kwargs))
+    try:
+        return await asyncio.shield(future)
+    except asyncio.CancelledError:
+        cancel_event.set()
+        try:
+            await future
+        except BaseException:
+            pass
+        raise
+
+async def fetch_async(version="latest", include=None, tune=False, tune_model=None, progress=None):
+    """Asyncio version of fetch(). Blocking work (hardware probes, GitHub API calls,
+    the download, extraction and the version check) runs on the default executor.
+
+    version is "latest", a tag such as "b3088", or a specifier such as
+    ">=b3000,<b3100" that resolves to the newest matching release with a build
+    for this host through the local release index (see parse_version_spec).
+
+    progress is a callable or an asyncio.Queue receiving event dicts with phase
+    ("hardware", "metadata", "download", "extract", "verify" or "done"), bytes_done,
+    bytes_total, throughput (bytes per second) and eta (seconds), either of the last
+    two None when unknown. Cancelling the task stops the download or extraction and
+    removes partial files before CancelledError propagates.
+    """
     # llama.cpp release tags are an integer prefixed with "b" (e.g. "b3091")
-    if version != "latest" and not version.startswith("b"):
+    spec = version if is_version_spec(version) else None
+    if not spec and version != "latest" and not version.startswith("b"):
         version = "b" + version
 
+    cancel = threading.Event()
+    report = _ProgressReporter(asyncio.get_running_loop(), progress)
+
     debug_print("Starting the download process...")
-    release_info = get_release_info(version)
-    system, arch = get_system_info()
-    has_gpu, gpu_vendor, cuda_version, driver_version = check_nvidia_gpu()
-    
-    if not has_gpu:
-        has_gpu, gpu_vendor, _ = check_amd_gpu()
-    
-    avx, avx2, avx512 = check_avx_support()
-    
-    asset_url = select_best_asset(
-        release_info['assets'], system, arch, gpu_vendor, driver_version, avx, avx2, avx512
-    )
+    report("hardware")
+    profile = await _offload(cancel, get_hardware_profile)
+    if spec:
+        report("metadata")
+        version = await _offload(cancel, _resolve_fetch_version, spec, profile)
+    system, arch = profile['system'], profile['arch']
+    has_gpu, gpu_vendor = profile['has_gpu'], profile['gpu_vendor']
+    cuda_version, driver_version = profile['cuda_version'], profile['driver_version']
+    avx, avx2, avx512 = profile['avx'], profile['avx2'], profile['avx512']
     
     result = {
         "success": False,
@@ -278,34 +2266,302 @@ def fetch(version="latest"):
         "os_name": platform.system(),
         "architecture": arch
     }
-    
-    if asset_url:
-        download_and_extract(asset_url, DOWNLOAD_DIR, EXTRACT_DIR)
-        debug_print("Download process completed.")
-        
-        # Extract the expected version from the release info or asset name
-        expected_version = release_info.get('tag_name')  # or parse from asset_url if needed
-        
-        # Run the extracted binary with '--version'
-        observed_version = run_binary_with_version(EXTRACT_DIR, expected_version)
-        
+
+    def installed_result(manifest):
+        report("done")
         result.update({
-            "success": observed_version is not None,
-            "message": "Suitable binary was found and ran successfully." if observed_version is not None else "Suitable binary was found but failed to run.",
-            "downloaded_file": asset_url.split('/')[-1] if asset_url else None,
-            "expected_version": expected_version,
-            "observed_version": observed_version
+            "success": True,
+            "message": "Suitable binary is already installed.",
+            "downloaded_file": manifest['asset'],
+            "expected_version": manifest['tag'],
+            "observed_version": manifest['observed_version'],
+            "install_dir": str(get_active_dir()),
+            "tuning_results": None
         })
-    else:
-        debug_print("No suitable binary found for your system.")
+        return result
+
+    # No-op fast path: the requested build is already active and intact
+    def already_installed():
+        if tune and not get_tuning(profile):
+            return None
+        manifest = _matching_install(profile, include, None if version == "latest" else version)
+        if manifest and (version != "latest" or time.time() - manifest.get('latest_checked_at', 0) < LATEST_TTL):
+            debug_print(f"{manifest['tag']} is already installed; nothing to do.")
+            return manifest
+        return None
+
+    manifest = already_installed()
+    if manifest:
+        return installed_result(manifest)
+
+    # Single flight: one process downloads and installs while others sharing the
+    # directory wait, then find the finished install through the fast path
+    lock = FileLock(Path(EXTRACT_DIR) / ".lock")
+    try:
+        await _offload(cancel, lock.acquire, cancel)
+        manifest = already_installed()
+        if manifest:
+            return installed_result(manifest)
+        tuning_pending = tune and not get_tuning(profile)
+
+        report("metadata")
+        release_info = await _offload(cancel, get_release_info, version)
+    
+        debug_print("Selecting the best asset for the system...")
+        ranking = apply_tuning(rank_assets(build_asset_index(release_info['assets']), profile), profile)
+        debug_print(f"Compatible assets, fastest first: {[record['name'] for record in ranking]}")
+        asset = ranking[0] if ranking else None
+        asset_url = asset['url'] if asset else None
+        tune_model = tune_model or TUNE_MODEL
     
+        if asset_url:
+            # Extract the expected version from the release info or asset name
+            expected_version = release_info.get('tag_name')  # or parse from asset_url if needed
+
+            if tuning_pending and len(ranking) == 1:
+                # A single compatible build leaves nothing to compare
+                save_tuning(profile, {
+                    "variant": _variant(asset),
+                    "asset": asset['name'],
+                    "model": None,
+                    "results": {},
+                    "measured_at": time.time(),
+                })
+                tuning_pending = False
+
+            manifest = None if tuning_pending else _matching_install(profile, include, expected_version, asset['name'])
+            # Switching back to the previous version is just re-pointing 'current'
+            if not manifest and not tuning_pending and _matching_install(
+                    profile, include, expected_version, asset['name'], Path(EXTRACT_DIR) / "previous"):
+                debug_print(f"{expected_version} is the previous version; rolling back to it.")
+                rollback()
+                manifest = read_manifest()
+            if manifest:
+                debug_print(f"{expected_version} is already installed; nothing to do.")
+                if version == "latest":
+                    update_manifest(latest_checked_at=time.time())
+                return installed_result(manifest)
+            manifest = {
+                "tag": expected_version,
+                "asset": asset['name'],
+                "url": asset_url,
+                "include": sorted(include) if include else None,
+                "profile": _profile_hash(profile),
+            }
+
+            winner, tuning_results = None, None
+            if tuning_pending:
+                if not tune_model:
+                    raise ValueError("Tune mode needs a small GGUF model (tune_model or FETCH_LLAMA_CPP_TUNE_MODEL).")
+                winner, tuning_results = await _offload(
+                    cancel, tune_candidates, ranking[:TUNE_CANDIDATES], expected_version, tune_model, profile,
+                    DOWNLOAD_DIR, EXTRACT_DIR, include, manifest, report, cancel)
+                if winner:
+                    asset, asset_url = winner, winner['url']
+                elif _matching_install(profile, include, expected_version, asset['name']):
+                    # Nothing could be measured: keep the top-ranked build if it's already installed
+                    return installed_result(read_manifest())
+            if not winner:
+                await _offload(cancel, download_and_extract, asset_url, DOWNLOAD_DIR, EXTRACT_DIR,
+                               size=asset['size'], digest=asset['digest'], version=expected_version,
+                               include=include, manifest=manifest, progress=report, cancel=cancel)
+            debug_print("Download process completed.")
+        
+            # Run the extracted binary with '--version'
+            report("verify")
+            observed_version = await _offload(cancel, run_binary_with_version, get_active_dir(), expected_version)
+            active_manifest = read_manifest()
+            if active_manifest and active_manifest.get('tag') == expected_version and active_manifest.get('asset') == asset['name']:
+                update_manifest(observed_version=observed_version,
+                                latest_checked_at=time.time() if version == "latest" else 0)
+        
+            result.update({
+                "success": observed_version is not None,
+                "message": "Suitable binary was found and ran successfully." if observed_version is not None else "Suitable binary was found but failed to run.",
+                "downloaded_file": asset_url.split('/')[-1] if asset_url else None,
+                "expected_version": expected_version,
+                "observed_version": observed_version,
+                "install_dir": str(get_active_dir()),
+                "tuning_results": tuning_results
+            })
+        else:
+            debug_print("No suitable binary found for your system.")
+    finally:
+        lock.release()
+
+    report("done")
     return result
 
-def main(version="latest"):
+# Async stream of fetch_async() progress events, ending with a "done" event that
+# carries the result. Closing the generator early cancels the fetch.
+async def fetch_events(version="latest", include=None, tune=False, tune_model=None):
+    queue = asyncio.Queue()
+    task = asyncio.ensure_future(fetch_async(version, include, tune, tune_model, progress=queue))
+    try:
+        while True:
+            getter = asyncio.ensure_future(queue.get())
+            await asyncio.wait([getter, task], return_when=asyncio.FIRST_COMPLETED)
+            if getter.done():
+                event = getter.result()
+                if event["phase"] != "done":
+                    yield event
+                continue
+            getter.cancel()
+            while not queue.empty():
+                event = queue.get_nowait()
+                if event["phase"] != "done":
+                    yield event
+            yield dict(phase="done", bytes_done=0, bytes_total=None, throughput=None, eta=None, result=task.result())
+            return
+    finally:
+        if not task.done():
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+
+# Runs a coroutine to completion from synchronous code, on a separate thread when
+# the caller is already inside a running event loop
+def _run_coroutine(coro):
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coro)
+    with concurrent.futures.ThreadPoolExecutor(max_workers=1) as executor:
+        return executor.submit(asyncio.run, coro).result()
+
+def fetch(version="latest", include=None, tune=False, tune_model=None):
+    return _run_coroutine(fetch_async(version, include, tune, tune_model))
+
+
+# Resolves tags, "latest" and version specifiers (see parse_version_spec) to their
+# release information, keyed by tag; specifiers are answered by the release index
+def resolve_releases(versions, workers=MIRROR_WORKERS):
+    tags = [version for version in versions if not is_version_spec(version)]
+    specs = [version for version in versions if is_version_spec(version)]
+
+    releases = {}
+    if specs:
+        sync_release_index(workers=workers)
+        for spec in specs:
+            releases.update((release['tag_name'], release) for release in query_releases(spec))
+    tags = [tag if tag == "latest" or tag.startswith("b") else "b" + tag for tag in tags]
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+        for release in executor.map(get_release_info, [tag for tag in tags if tag not in releases]):
+            releases[release['tag_name']] = release
+    return releases
+
+# Local path of an asset inside a mirror, mirroring its GitHub download URL path
+def _mirror_asset_path(mirror_dir, asset):
+    parts = PurePosixPath(urllib.parse.unquote(urllib.parse.urlsplit(asset['browser_download_url']).path)).parts[1:]
+    if not parts or any(part in ("", ".", "..") for part in parts):
+        raise ValueError(f"Unexpected asset URL: {asset['browser_download_url']}")
+    return Path(mirror_dir, *parts)
+
+def _mirror_release_path(mirror_dir, version):
+    return Path(mirror_dir, "api", "repos", *GITHUB_REPO.split("/"), "releases",
+                *(["latest"] if version == "latest" else ["tags", version]))
+
+def _mirror_release_list_path(mirror_dir):
+    return Path(mirror_dir, "api", "repos", *GITHUB_REPO.split("/"), "releases.json")
+
+# Builds or tops up an offline mirror of the releases matching versions (see
+# resolve_releases) in mirror_dir, laid out like the GitHub API and download URLs so
+# fetch() can use it through FETCH_LLAMA_CPP_MIRROR. With profiles (as returned by
+# get_hardware_profile) only the top `candidates` builds for each are mirrored,
+# otherwise every asset; patterns further limit assets by name. Assets already in
+# the mirror are kept. Returns the mirror index.
+def mirror(mirror_dir, versions=("latest",), profiles=None, patterns=None, candidates=1,
+           workers=MIRROR_WORKERS, progress=None, cancel=None):
+    mirror_dir = Path(mirror_dir)
+    releases = resolve_releases(versions, workers)
+    index_path = mirror_dir / MIRROR_INDEX_NAME
+    index = _read_json(index_path) or {"repo": GITHUB_REPO, "releases": {}}
+
+    jobs = []
+    for tag, release in releases.items():
+        wanted = {asset['name'] for asset in release['assets']}
+        if profiles is not None:
+            ranked = build_asset_index(release['assets'])
+            wanted = {record['name'] for profile in profiles for record in rank_assets(ranked, profile)[:candidates]}
+        if patterns:
+            wanted = {name for name in wanted if any(fnmatch.fnmatch(name, pattern) for pattern in patterns)}
+        known = index['releases'].get(tag, {}).get('assets', {})
+        for asset in release['assets']:
+            if asset['name'] not in wanted:
+                continue
+            path = _mirror_asset_path(mirror_dir, asset)
+            if asset['name'] in known and path.exists() and path.stat().st_size == asset.get('size'):
+                continue
+            jobs.append((tag, asset, path))
+
+    total = sum(asset.get('size') or 0 for _, asset, _ in jobs)
+    received = {"bytes": 0, "lock": threading.Lock()}
+    debug_print(f"Mirroring {len(jobs)} asset(s), {total} bytes, from {len(releases)} release(s)...")
+
+    def fetch_asset(session, tag, asset, path):
+        done = {"bytes": 0}
+
+        def asset_progress(phase, size, _total):
+            with received["lock"]:
+                received["bytes"] += size - done["bytes"]
+                done["bytes"] = size
+                progress("mirror", received["bytes"], total)
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        download_file(mirror_asset_url(asset['browser_download_url']), path, session=session,
+                      progress=asset_progress if progress else None, cancel=cancel)
+        sha256 = file_sha256(path)
+        digest = asset.get('digest')
+        if digest and digest.startswith('sha256:') and digest.split(':', 1)[1] != sha256:
+            path.unlink()
+            raise ValueError(f"Digest mismatch for {asset['name']}: expected {digest}, got sha256:{sha256}")
+        return {"size": path.stat().st_size, "sha256": sha256, "path": path.relative_to(mirror_dir).as_posix()}
+
+    # Assets that did download are recorded even when others fail
+    error = None
+    with _new_session(workers) as session, concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(fetch_asset, session, tag, asset, path): (tag, asset) for tag, asset, path in jobs}
+        for future in concurrent.futures.as_completed(futures):
+            tag, asset = futures[future]
+            try:
+                entry = future.result()
+            except Exception as e:
+                debug_print(f"Failed to mirror {asset['name']}: {e}")
+                error = error or e
+                continue
+            release_entry = index['releases'].setdefault(tag, {"published_at": releases[tag].get('published_at'),
+                                                               "assets": {}})
+            release_entry['assets'][asset['name']] = entry
+            debug_print(f"Mirrored {asset['name']}")
+
+    # Each release document lists only the assets the mirror actually holds, so
+    # hosts using the mirror never select a build it can't serve
+    for tag, release in releases.items():
+        held = index['releases'].get(tag, {}).get('assets', {})
+        if held:
+            _write_json(_mirror_release_path(mirror_dir, tag),
+                        dict(release, assets=[asset for asset in release['assets'] if asset['name'] in held]))
+    tags = [tag for tag in index['releases'] if _mirror_release_path(mirror_dir, tag).exists()]
+    if tags:
+        index['latest'] = max(tags, key=lambda tag: _tag_number(tag) or -1)
+        shutil.copyfile(_mirror_release_path(mirror_dir, index['latest']), _mirror_release_path(mirror_dir, "latest"))
+    # The release list behind version specifiers (see _releases_url), newest first
+    tags.sort(key=lambda tag: _tag_number(tag) or -1, reverse=True)
+    _write_json(_mirror_release_list_path(mirror_dir),
+                [_read_json(_mirror_release_path(mirror_dir, tag)) for tag in tags])
+    index['updated_at'] = time.time()
+    _write_json(index_path, index)
+    if error:
+        raise error
+    return index
+
+def main(version="latest", include=None, tune=False, tune_model=None):
     #DEBUG=True
     result = None
     try:
-        result = fetch(version)
+        result = fetch(version, include=include, tune=tune, tune_model=tune_model)
     except Exception as e:
         if DEBUG:
             raise
@@ -331,7 +2587,173 @@ def main(version="latest"):
         else:
             print(f"{os.path.basename(__file__)}: It really whips the llama's ass! - Winamp (1997)")
 
+def format_size(size):
+    for unit in ["B", "KiB", "MiB", "GiB"]:
+        if size < 1024 or unit == "GiB":
+            return f"{size:.1f} {unit}" if unit != "B" else f"{size} {unit}"
+        size /= 1024
+
+def cache_main(argv):
+    import argparse
+    parser = argparse.ArgumentParser(prog="fetch_llama_cpp cache", description="Manage the downloaded asset cache.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("list", help="List cached assets, most recently used first")
+    prune_parser = subparsers.add_parser("prune", help="Evict least recently used unpinned assets")
+    prune_parser.add_argument("--max-size", type=int, default=None, help=f"Target cache size in bytes (default {CACHE_MAX_SIZE})")
+    prune_parser.add_argument("--all", action="store_true", help="Evict every unpinned asset")
+    for command in ["pin", "unpin"]:
+        pin_parser = subparsers.add_parser(command, help=f"{command.capitalize()} an asset so it is{' not' if command == 'unpin' else ' never'} evicted")
+        pin_parser.add_argument("name", help="Asset file name, e.g. llama-b3088-bin-ubuntu-x64.zip")
+    args = parser.parse_args(argv)
+
+    if args.command == "list":
+        entries = cache_list()
+        for entry in entries:
+            pinned = " (pinned)" if entry['pinned'] else ""
+            last_used = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(entry['last_used']))
+            print(f"{entry['name']}  {format_size(entry['size'])}  {last_used}{pinned}")
+        print(f"{len(entries)} asset(s), {format_size(sum(entry['size'] for entry in entries))} in {CACHE_DIR}")
+    elif args.command == "prune":
+        evicted = cache_prune(args.max_size, everything=args.all)
+        print(f"Evicted {len(evicted)} asset(s), freeing {format_size(sum(entry['size'] for entry in evicted))}.")
+    else:
+        matched = cache_pin(args.name, pinned=args.command == "pin")
+        if not matched:
+            print(f"{args.name} is not in the cache.")
+            exit(1)
+        print(f"{args.command.capitalize()}ned {args.name}.")
+
+def store_main(argv):
+    import argparse
+    parser = argparse.ArgumentParser(prog="fetch_llama_cpp store",
+                                     description="Inspect or clean up the deduplicating store of installed files.")
+    parser.add_argument("command", choices=["stats", "gc"], help="Show savings, or remove blobs no version uses")
+    parser.add_argument("--install-dir", default=None, help=f"Install root (default {EXTRACT_DIR})")
+    args = parser.parse_args(argv)
+
+    if args.command == "gc":
+        removed, freed = store_gc(args.install_dir)
+        print(f"Removed {removed} unreferenced blob(s), freeing {format_size(freed)}.")
+        return
+    stats = store_stats(args.install_dir)
+    print(f"{stats['blobs']} blob(s), {format_size(stats['blob_bytes'])} in {get_store_dir(args.install_dir)}")
+    print(f"Disk saved by hardlinks: {format_size(stats['saved_bytes'])}")
+    print(f"Reused: {stats['reused_files']} file(s), {format_size(stats['reused_bytes'])}, "
+          f"{stats['seconds_avoided']:.1f}s of extraction avoided")
+    if stats['unreferenced_bytes']:
+        print(f"Unreferenced: {format_size(stats['unreferenced_bytes'])} (run 'fetch_llama_cpp store gc')")
+
+def verify_main(argv):
+    import argparse
+    parser = argparse.ArgumentParser(prog="fetch_llama_cpp verify",
+                                     description="Re-hash the active install and compare it with its manifest.")
+    parser.add_argument("directory", nargs="?", default=None, help=f"Install to verify (default {get_active_dir()})")
+    args = parser.parse_args(argv)
+
+    problems = verify_install(args.directory)
+    for name, problem in sorted(problems.items()):
+        print(f"{name}: {problem}")
+    if problems:
+        exit(1)
+    print("All files match the install manifest.")
+
+# A profile is "host", a hardware root such as samples/hardware/linux-nvidia, or a
+# JSON file holding one profile or a list of them
+def _load_profiles(spec):
+    if spec == "host":
+        return [get_hardware_profile()]
+    if Path(spec).is_dir():
+        return [get_hardware_profile(use_cache=False, root=spec)]
+    profiles = json.loads(Path(spec).read_text())
+    return profiles if isinstance(profiles, list) else [profiles]
+
+def mirror_main(argv):
+    import argparse
+    parser = argparse.ArgumentParser(prog="fetch_llama_cpp mirror",
+                                     description="Download releases into a mirror for hosts without GitHub access.",
+                                     epilog="Serve the directory over HTTP (or share it) and set FETCH_LLAMA_CPP_MIRROR "
+                                            "to its URL, e.g. http://mirror.lan/llama or file:///srv/llama-mirror.")
+    parser.add_argument("directory", help="Mirror directory (created or topped up)")
+    parser.add_argument("versions", nargs="*", default=["latest"],
+                        help="Release tags, 'latest' or ranges such as b3000..b3100 (default: latest)")
+    parser.add_argument("--profile", action="append", metavar="PROFILE",
+                        help="Only mirror the best builds for 'host', a hardware root or a JSON profile file (repeatable)")
+    parser.add_argument("--candidates", type=int, default=1, help="Builds to mirror per profile (default 1)")
+    parser.add_argument("--asset", action="append", metavar="GLOB", help="Only mirror assets matching GLOB (repeatable)")
+    parser.add_argument("--workers", type=int, default=MIRROR_WORKERS, help=f"Concurrent downloads (default {MIRROR_WORKERS})")
+    args = parser.parse_args(argv)
+
+    profiles = [profile for spec in args.profile for profile in _load_profiles(spec)] if args.profile else None
+    started = time.monotonic()
+    index = mirror(args.directory, args.versions, profiles, args.asset, args.candidates, args.workers)
+    assets = [asset for release in index['releases'].values() for asset in release['assets'].values()]
+    print(f"{len(index['releases'])} release(s), {len(assets)} asset(s), "
+          f"{format_size(sum(asset['size'] for asset in assets))} in {args.directory} "
+          f"({time.monotonic() - started:.1f}s); latest is {index.get('latest')}.")
+
+def releases_main(argv):
+    import argparse
+    parser = argparse.ArgumentParser(prog="fetch_llama_cpp releases", description="Query the local release index.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    sync_parser = subparsers.add_parser("sync", help="Sync the release index from GitHub")
+    sync_parser.add_argument("--full", action="store_true", help="Re-read every page instead of only new releases")
+    list_parser = subparsers.add_parser("list", help="List indexed releases matching a specifier, newest first")
+    list_parser.add_argument("spec", nargs="?", default="*", help="e.g. '>=b3000,<b3100' or b3000..b3100 (default: all)")
+    list_parser.add_argument("--system", help="Require a build for this OS (linux, windows, darwin)")
+    list_parser.add_argument("--arch", help="Require a build for this architecture (x86_64, arm64)")
+    list_parser.add_argument("--backend", help="Require a build with this backend (cuda, hip, vulkan, cpu, ...)")
+    list_parser.add_argument("--cuda", help="Require a CUDA build of this version prefix, e.g. 12 or 12.2")
+    list_parser.add_argument("--host", action="store_true", help="Require a build that runs on this host")
+    list_parser.add_argument("--prerelease", action="store_true", help="Include prereleases")
+    list_parser.add_argument("--limit", type=int, default=None, help="Show at most this many releases")
+    args = parser.parse_args(argv)
+
+    if args.command == "sync":
+        count = sync_release_index(full=args.full)
+        print(f"Indexed {count} new or updated release(s) in {_release_index_path()}.")
+        return
+    releases = query_releases(args.spec, prerelease=args.prerelease, system=args.system, arch=args.arch,
+                              backend=args.backend, cuda=args.cuda,
+                              profile=get_hardware_profile() if args.host else None, limit=args.limit)
+    for release in releases:
+        print(f"{release['tag_name']}  {release['published_at']}  {len(release['assets'])} asset(s)")
+    if not releases:
+        print("No indexed release matches; run 'fetch_llama_cpp releases sync' to update the index.")
+        exit(1)
+
+def cli(argv=None):
+    import argparse
+    argv = sys.argv[1:] if argv is None else argv
+    if argv and argv[0] == "releases":
+        releases_main(argv[1:])
+        return
+    if argv and argv[0] == "mirror":
+        mirror_main(argv[1:])
+        return
+    if argv and argv[0] == "cache":
+        cache_main(argv[1:])
+        return
+    if argv and argv[0] == "store":
+        store_main(argv[1:])
+        return
+    if argv and argv[0] == "verify":
+        verify_main(argv[1:])
+        return
+    parser = argparse.ArgumentParser(prog="fetch_llama_cpp", description="Fetch the best llama.cpp build for this system.",
+                                     epilog="Run 'fetch_llama_cpp cache --help' to manage the asset cache, "
+                                            "'fetch_llama_cpp verify' to check the active install for corruption, "
+                                            "'fetch_llama_cpp store stats' to see what deduplication saves, "
+                                            "'fetch_llama_cpp mirror --help' to build an offline mirror, or "
+                                            "'fetch_llama_cpp releases --help' to query the release index.")
+    parser.add_argument("version", nargs="?", default="latest",
+                        help="Release tag such as b3088, or a specifier such as '>=b3000,<b3100' (default: latest)")
+    parser.add_argument("--include", action="append", metavar="GLOB",
+                        help=f"Only fetch matching files (repeatable); profiles: {', '.join(INCLUDE_PROFILES)}")
+    parser.add_argument("--tune", action="store_true",
+                        help="Benchmark the top compatible builds and keep the fastest (remembered for this host)")
+    parser.add_argument("--tune-model", metavar="GGUF", help="Small model used for tuning (default $FETCH_LLAMA_CPP_TUNE_MODEL)")
+    args = parser.parse_args(argv)
+    main(args.version, include=args.include, tune=args.tune, tune_model=args.tune_model)
+
 if __name__ == "__main__":
-    import sys
-    version = sys.argv[1] if len(sys.argv) > 1 else "latest"
-    main(version)
+    cli()
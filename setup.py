@@ -16,7 +16,7 @@ setup(
     ],
     entry_points={
         'console_scripts': [
-            'fetch_llama_cpp = fetch_llama_cpp:fetch',
+            'fetch_llama_cpp = fetch_llama_cpp.fetch_llama_cpp:cli',
         ],
     },
     author="Sam Johnston",
@@ -31,7 +31,6 @@ setup(
         "Topic :: System :: Installation/Setup",
         "Topic :: Scientific/Engineering :: Artificial Intelligence",
         "Programming Language :: Python :: 3",
-        "Programming Language :: Python :: 3.6",
         "Programming Language :: Python :: 3.7",
         "Programming Language :: Python :: 3.8",
         "Programming Language :: Python :: 3.9",
@@ -45,5 +44,5 @@ setup(
         "Intended Audience :: System Administrators",
         "Intended Audience :: Information Technology",
     ],
-    python_requires='>=3.6',
+    python_requires='>=3.7',
 )
@@ -0,0 +1,68 @@
+import sys
+import os
+import re
+import time
+import tempfile
+import threading
+import http.server
+from pathlib import Path
+
+# Add the correct parent directory to the sys.path
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from fetch_llama_cpp.fetch_llama_cpp import download_file, download_file_segmented
+
+# Local stand-in for the GitHub/CDN asset host: serves an in-memory payload with
+# Range support and throttles every connection to a fixed rate
+PAYLOAD = os.urandom(32 * 1024 * 1024)
+RATE_PER_CONNECTION = 4 * 1024 * 1024  # bytes per second
+CONNECTIONS = [1, 2, 4, 8]
+
+class ThrottledRangeHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def do_HEAD(self):
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(PAYLOAD)))
+        self.send_header('Accept-Ranges', 'bytes')
+        self.end_headers()
+
+    def do_GET(self):
+        match = re.match(r'bytes=(\d+)-(\d*)', self.headers.get('Range', ''))
+        if match:
+            start = int(match.group(1))
+            end = int(match.group(2)) if match.group(2) else len(PAYLOAD) - 1
+            self.send_response(206)
+            self.send_header('Content-Range', f'bytes {start}-{end}/{len(PAYLOAD)}')
+        else:
+            start, end = 0, len(PAYLOAD) - 1
+            self.send_response(200)
+        self.send_header('Content-Length', str(end + 1 - start))
+        self.send_header('Accept-Ranges', 'bytes')
+        self.end_headers()
+
+        block = RATE_PER_CONNECTION // 10
+        for offset in range(start, end + 1, block):
+            self.wfile.write(PAYLOAD[offset:min(offset + block, end + 1)])
+            time.sleep(0.1)
+
+server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), ThrottledRangeHandler)
+threading.Thread(target=server.serve_forever, daemon=True).start()
+url = f"http://127.0.0.1:{server.server_address[1]}/llama-bench-bin.zip"
+
+with tempfile.TemporaryDirectory() as tmp:
+    for connections in CONNECTIONS:
+        file_path = Path(tmp) / f"asset-{connections}.zip"
+        started = time.perf_counter()
+        if connections == 1:
+            download_file(url, file_path)
+        else:
+            download_file_segmented(url, file_path, connections=connections, min_segment_size=1024 * 1024)
+        elapsed = time.perf_counter() - started
+        assert file_path.read_bytes() == PAYLOAD, "Downloaded payload does not match"
+        print(f"{connections} connection(s): {elapsed:.2f}s ({len(PAYLOAD) / elapsed / 1024 / 1024:.1f} MiB/s)")
+
+server.shutdown()
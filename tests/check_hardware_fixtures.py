@@ -0,0 +1,36 @@
+import sys
+import json
+from pathlib import Path
+
+# Add the correct parent directory to the sys.path
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from fetch_llama_cpp import fetch_llama_cpp
+
+# Probes the host fixtures under samples/hardware, which must never consult the
+# real machine, and checks their profiles and the build each would select from
+# samples/release-b3088.json
+SAMPLES = Path(__file__).resolve().parent.parent / "samples"
+EXPECTED = {
+    "linux-nvidia": {
+        "system": "linux", "arch": "x86_64", "has_gpu": True, "gpu_vendor": "nvidia", "gpu_vendors": ["nvidia"],
+        "cuda_version": "12.2", "driver_version": "535.54.03", "avx": True, "avx2": True, "avx512": True,
+    },
+    "linux-amd": {
+        "system": "linux", "arch": "x86_64", "has_gpu": True, "gpu_vendor": "amd", "gpu_vendors": ["amd"],
+        "cuda_version": None, "driver_version": None, "avx": True, "avx2": True, "avx512": False,
+    },
+}
+EXPECTED_PICK = "llama-b3089-bin-ubuntu-x64.zip"
+
+if __name__ == "__main__":
+    release = json.loads((SAMPLES / "release-b3088.json").read_text())
+    index = fetch_llama_cpp.build_asset_index(release['assets'])
+
+    for name, expected in EXPECTED.items():
+        profile = fetch_llama_cpp.get_hardware_profile(use_cache=False, root=SAMPLES / "hardware" / name)
+        assert profile == expected, f"{name}: unexpected profile {profile}"
+        ranking = fetch_llama_cpp.rank_assets(index, profile)
+        assert ranking and ranking[0]['name'] == EXPECTED_PICK, \
+            f"{name}: expected {EXPECTED_PICK}, ranked {[record['name'] for record in ranking]}"
+        print(f"{name}: {profile['gpu_vendor']} GPU, driver {profile['driver_version']}, selects {ranking[0]['name']}")
@@ -0,0 +1,76 @@
+import sys
+import json
+import tempfile
+import threading
+import http.server
+from pathlib import Path
+
+# Add the correct parent directory to the sys.path
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from fetch_llama_cpp import fetch_llama_cpp
+
+# Mirrors several tags at once from a local stand-in for the GitHub API that sends
+# rate limit headers, so the release lookups record the rate limit concurrently, and
+# checks that every run succeeds and keeps the lowest remaining count
+RUNS = 10
+TAGS = [f"b{number}" for number in range(1, 9)]
+RATE_LIMIT = 5000
+
+if __name__ == "__main__":
+    requests_seen = {"count": 0, "lock": threading.Lock()}
+
+    class StandInHandler(http.server.BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            port = self.server.server_address[1]
+            name = self.path.rsplit("/", 1)[-1]
+            if "/download/" in self.path:
+                body = name.encode()
+                headers = {}
+            else:
+                with requests_seen["lock"]:
+                    requests_seen["count"] += 1
+                    remaining = RATE_LIMIT - requests_seen["count"]
+                body = json.dumps({
+                    "tag_name": name,
+                    "published_at": "2024-06-05T00:00:00Z",
+                    "assets": [{
+                        "name": f"llama-{name}-bin-ubuntu-x64.zip",
+                        "size": len(f"llama-{name}-bin-ubuntu-x64.zip"),
+                        "browser_download_url": f"http://127.0.0.1:{port}/download/{name}/llama-{name}-bin-ubuntu-x64.zip",
+                    }],
+                }).encode()
+                headers = {
+                    "X-RateLimit-Limit": str(RATE_LIMIT),
+                    "X-RateLimit-Remaining": str(remaining),
+                    "X-RateLimit-Reset": "4102444800",
+                }
+            self.send_response(200)
+            for key, value in headers.items():
+                self.send_header(key, value)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), StandInHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    fetch_llama_cpp.GITHUB_API_URL = f"http://127.0.0.1:{server.server_address[1]}/repos/{{repo}}/releases/{{tags}}{{version}}"
+
+    for run in range(RUNS):
+        with tempfile.TemporaryDirectory() as workdir:
+            fetch_llama_cpp.CACHE_DIR = Path(workdir) / "cache"
+            index = fetch_llama_cpp.mirror(Path(workdir) / "mirror", versions=TAGS)
+            assert sorted(index['releases']) == sorted(TAGS), f"Run {run}: mirrored {sorted(index['releases'])}"
+            recorded = json.loads(fetch_llama_cpp._rate_limit_path().read_text())
+            with requests_seen["lock"]:
+                expected = RATE_LIMIT - requests_seen["count"]
+            assert recorded['remaining'] == expected, \
+                f"Run {run}: recorded {recorded['remaining']} remaining, expected {expected}"
+            leftovers = list(fetch_llama_cpp.CACHE_DIR.rglob("*.tmp"))
+            assert not leftovers, f"Run {run}: left temporary files behind: {leftovers}"
+
+    server.shutdown()
+    print(f"{RUNS} mirror runs of {len(TAGS)} tags succeeded, {requests_seen['count']} API requests")
@@ -0,0 +1,85 @@
+import sys
+import io
+import json
+import time
+import zipfile
+import tempfile
+import threading
+import http.server
+import multiprocessing
+from pathlib import Path
+
+# Add the correct parent directory to the sys.path
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from fetch_llama_cpp import fetch_llama_cpp
+
+# Starts many processes calling fetch() against one install directory, served by a
+# local stand-in for the GitHub API and release downloads, and checks that the
+# release asset was downloaded exactly once
+PROCESSES = 16
+TAG = "b9999"
+ASSET = f"llama-{TAG}-bin-ubuntu-x64.zip"
+
+def build_asset():
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w') as zip_ref:
+        zip_ref.writestr('build/bin/main', f"#!/bin/sh\necho 'version: {TAG[1:]} (stress)' >&2\n")
+        zip_ref.writestr('build/bin/libllama.so', b'\0' * 4 * 1024 * 1024)
+    return buffer.getvalue()
+
+def run_fetch(workdir, port, results):
+    import os
+    os.chdir(workdir)
+    fetch_llama_cpp.GITHUB_API_URL = f"http://127.0.0.1:{port}/repos/{{repo}}/releases/{{tags}}{{version}}"
+    fetch_llama_cpp.CACHE_DIR = Path(workdir) / "cache"
+    result = fetch_llama_cpp.fetch(TAG)
+    results.put((result['success'], result['message']))
+
+if __name__ == "__main__":
+    payload = build_asset()
+    downloads = []
+
+    class StandInHandler(http.server.BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            if self.path.endswith(ASSET):
+                downloads.append(self.path)
+                time.sleep(1)  # Give every process time to pile up on the lock
+                body = payload
+            else:
+                body = json.dumps({
+                    "tag_name": TAG,
+                    "published_at": "2024-06-05T00:00:00Z",
+                    "assets": [{
+                        "name": ASSET,
+                        "size": len(payload),
+                        "browser_download_url": f"http://127.0.0.1:{self.server.server_address[1]}/download/{ASSET}",
+                    }],
+                }).encode()
+            self.send_response(200)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), StandInHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        results = multiprocessing.Queue()
+        processes = [multiprocessing.Process(target=run_fetch, args=(workdir, server.server_address[1], results))
+                     for _ in range(PROCESSES)]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+        outcomes = [results.get() for _ in processes]
+
+    server.shutdown()
+    print(f"{PROCESSES} processes, {sum(success for success, _ in outcomes)} succeeded, {len(downloads)} download(s)")
+    for message in sorted({message for _, message in outcomes}):
+        print(f"  {message}")
+    assert all(success for success, _ in outcomes), "Some fetch() calls failed"
+    assert len(downloads) == 1, f"Expected exactly one download, saw {len(downloads)}"